@@ -0,0 +1,128 @@
+import asyncio
+import concurrent.futures
+import itertools
+import weakref
+
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy
+
+"""
+asyncio interface for scoring many simultaneous sessions (e.g. drawings), without stalling the event loop.
+
+Each AsyncScoringSession owns one engine, and runs its steps on an executor: await session.record(degrees) queues the move,
+and returns its score, pos_add, neg_add and running final score (as MovePredictionEngine.stream_scores() yields), once it's been scored.
+
+- Moves of one session are scored in order, one executor call at a time. Moves queued while a call runs are scored together in the next call.
+- Different sessions are scored concurrently, as far as the executor allows.
+- Each session's queue holds at most max_pending moves. Once it's full, record() waits for space, so fast producers are slowed to the scoring rate.
+
+The engines live in the process that runs their steps, in Engines (by session id), so they're never pickled or copied between calls.
+With a thread executor (the default), that's this process. With processes, each session must always use the same process:
+give each session a single-worker ProcessPoolExecutor, shared by a subset of the sessions (see create_process_shards()).
+"""
+
+# The engines of the sessions scored in this process, by session id.
+Engines = {}
+
+SessionIds = itertools.count()
+
+def create_engine(session_id, engine_type, history_depth_count, engine_options):
+    Engines[session_id] = engine_type(history_depth_count, **engine_options)
+
+def score_moves(session_id, degrees):
+    engine = Engines[session_id]
+    return [engine.score_move(degree) + (engine.get_final_score(),) for degree in degrees]
+
+def close_engine(session_id):
+    Engines.pop(session_id, None)
+
+# The executors made by create_process_shards(), which are known to have a single worker.
+ProcessShards = weakref.WeakSet()
+
+# Single-worker process executors, to spread sessions over (e.g. by session number modulo count). Each session's engine stays in one process.
+def create_process_shards(count):
+    shards = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(count)]
+    ProcessShards.update(shards)
+    return shards
+
+class AsyncScoringSession:
+    # engine_options are passed to engine_type, after history_depth_count (e.g. base_weights, or decay).
+    # executor defaults to the event loop's default (thread) executor. A ProcessPoolExecutor must have a single worker (see above):
+    # either one from create_process_shards(), or one the caller created, with its worker count given as executor_workers.
+    def __init__(self, history_depth_count, engine_type=MovePredictionEngineNumpy, executor=None, max_pending=64, executor_workers=None, **engine_options):
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor) and executor not in ProcessShards and executor_workers != 1:
+            raise ValueError("A process executor must have a single worker, so the session's engine stays in one process: "
+                             "use create_process_shards(), or give executor_workers=1")
+        self.session_id = next(SessionIds)
+        self.history_depth = history_depth_count
+        self.engine_type = engine_type
+        self.engine_options = engine_options
+        self.executor = executor
+        self.max_pending = max_pending
+
+        # Created on the first record(), as they need the running event loop.
+        self.queue = None
+        self.worker = None
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Queues a move (waiting while the queue is full), and returns its score, pos_add, neg_add and the running final score, once it's scored.
+    async def record(self, degrees):
+        if self.closed:
+            raise RuntimeError("Session is closed")
+        if self.worker is None:
+            self.queue = asyncio.Queue(self.max_pending)
+            self.worker = asyncio.get_running_loop().create_task(self.run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((degrees, future))
+        return await future
+
+    # Scores the moves queued so far, then releases the engine. Moves can't be recorded after this.
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.worker is not None:
+            await self.queue.put(None)
+            await self.worker
+
+    # Scores queued moves, in order, until close(). Each executor call scores all the moves queued when it starts.
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        error = None
+        try:
+            await loop.run_in_executor(self.executor, create_engine, self.session_id, self.engine_type, self.history_depth, self.engine_options)
+        except Exception as e:
+            error = e
+
+        closing = False
+        while not closing:
+            items = [await self.queue.get()]
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            if items[-1] is None:
+                closing = True
+                items.pop()
+            if not items:
+                continue
+
+            try:
+                if error is not None:
+                    raise error
+                results = await loop.run_in_executor(self.executor, score_moves, self.session_id, [degrees for degrees, future in items])
+            except Exception as e:
+                for degrees, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (degrees, future), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+
+        if error is None:
+            await loop.run_in_executor(self.executor, close_engine, self.session_id)
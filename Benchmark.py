@@ -0,0 +1,161 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from EngineBackends import Backends
+from MovePredictionEngine import BaseMoveWeights, DemoMoveSeries
+from MovePredictionEngineBatch import pad_move_series, score_move_series
+
+"""
+Reproducible benchmarks of the scoring engines, written as JSON, for tracking performance (and scores) between versions.
+
+Every workload is seeded, so each run scores exactly the same games:
+- demo: the DemoMoveSeries games (30 moves each).
+- random-30, random-80, random-300, random-1000: random games of that many moves.
+- corpus-80: a corpus of random 80-move games, which "batch-corpus" scores all together, with score_move_series().
+
+Each backend registered in EngineBackends is run on each workload, game by game. For each, the results are:
+- Per-move latency percentiles (ms), from timing each move's record and score.
+- Throughput, in games and moves per second.
+- Peak memory (bytes allocated, as traced by tracemalloc) while playing the workload's first game. Measured in a separate run, as tracing is slow.
+- The mean final score, so a change in scores shows up along with any change in speed.
+
+The reference engine is pure Python, so it's only run on games of up to ReferenceMaxMoves moves.
+
+Run with: python Benchmark.py --output benchmark.json
+"""
+
+ReferenceMaxMoves = 300
+
+# Game counts of each workload, by move count. Scaled down by --quick.
+RandomGameCounts = {30: 50, 80: 20, 300: 5, 1000: 2}
+CorpusGameCount = 256
+
+# The workloads, as (name, list of games), generated from seed.
+def get_workloads(seed=0, scale=1.0):
+    rnd = random.Random(seed)
+    workloads = [("demo", [list(map(float, moves)) for moves in DemoMoveSeries])]
+    for move_count, game_count in RandomGameCounts.items():
+        games = [[rnd.random() * BaseMoveWeights.CircularRange for _ in range(move_count)] for _ in range(max(1, int(game_count * scale)))]
+        workloads.append((f"random-{move_count}", games))
+    games = [[rnd.random() * BaseMoveWeights.CircularRange for _ in range(80)] for _ in range(max(1, int(CorpusGameCount * scale)))]
+    workloads.append(("corpus-80", games))
+    return workloads
+
+# Plays each game with a new engine, timing every move. Returns the results for one configuration and workload.
+def run_engine_workload(create_engine, games, measure_memory=True):
+    latencies = []
+    final_scores = []
+    start = time.perf_counter()
+    for degrees in games:
+        engine = create_engine(len(degrees))
+        for degree in degrees:
+            move_start = time.perf_counter()
+            engine.score_move(degree)
+            latencies.append(time.perf_counter() - move_start)
+        final_scores.append(engine.get_final_score())
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    results = {
+        "latency_ms_p50": float(np.percentile(latencies, 50)),
+        "latency_ms_p90": float(np.percentile(latencies, 90)),
+        "latency_ms_p99": float(np.percentile(latencies, 99)),
+        "latency_ms_max": float(latencies.max()),
+    }
+    results.update(get_throughput(games, elapsed, final_scores))
+    if measure_memory:
+        results["peak_memory_bytes"] = get_peak_memory(lambda: play_game(create_engine, games[0]))
+    return results
+
+def play_game(create_engine, degrees):
+    engine = create_engine(len(degrees))
+    for degree in degrees:
+        engine.score_move(degree)
+
+# Scores all the games at once, with the batch engine. There's no per-move latency, as each step scores a move of every game.
+def run_batch_workload(games, measure_memory=True):
+    degrees, lengths = pad_move_series(games)
+    start = time.perf_counter()
+    final_scores, pos_sums, neg_sums = score_move_series(degrees, lengths)
+    elapsed = time.perf_counter() - start
+
+    results = get_throughput(games, elapsed, final_scores.tolist())
+    if measure_memory:
+        results["peak_memory_bytes"] = get_peak_memory(lambda: score_move_series(degrees, lengths))
+    return results
+
+def get_throughput(games, elapsed, final_scores):
+    move_count = sum(len(degrees) for degrees in games)
+    return {
+        "games": len(games),
+        "moves": move_count,
+        "seconds": elapsed,
+        "games_per_second": len(games) / elapsed,
+        "moves_per_second": move_count / elapsed,
+        "mean_final_score": float(np.nanmean(final_scores)),
+    }
+
+def get_peak_memory(work):
+    tracemalloc.start()
+    try:
+        work()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def get_environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "commit": commit,
+    }
+
+# Runs the benchmarks of the given engines (names in Backends, or "batch-corpus"), and returns them with the environment and settings.
+def run_benchmarks(engines=None, seed=0, scale=1.0, measure_memory=True, progress=None):
+    engines = engines or list(Backends) + ["batch-corpus"]
+    results = []
+    for workload, games in get_workloads(seed, scale):
+        for name in engines:
+            if name == "batch-corpus":
+                if not workload.startswith("corpus"):
+                    continue
+                result = run_batch_workload(games, measure_memory)
+            else:
+                if name == "reference" and max(len(degrees) for degrees in games) > ReferenceMaxMoves:
+                    continue
+                result = run_engine_workload(Backends[name], games, measure_memory)
+            result = dict(engine=name, workload=workload, **result)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+
+    return {"environment": get_environment(), "settings": {"seed": seed, "scale": scale}, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the seeded engine benchmarks, and writes the results as JSON.")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--engines", nargs="+", choices=list(Backends) + ["batch-corpus"], help="Engines (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="Run 1/10 of the games of each workload")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slow) peak memory runs")
+    args = parser.parse_args()
+
+    def progress(result):
+        print(f"{result['workload']:>12} {result['engine']:>10} {result['moves_per_second']:>12.0f} moves/s  p99 {result.get('latency_ms_p99', float('nan')):8.3f} ms")
+
+    benchmarks = run_benchmarks(args.engines, args.seed, 0.1 if args.quick else 1.0, not args.no_memory, progress)
+    with open(args.output, "w") as f:
+        json.dump(benchmarks, f, indent=2)
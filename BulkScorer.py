@@ -0,0 +1,131 @@
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import math
+import os
+import sys
+
+from MovePredictionEngine import BaseMoveWeights
+from MovePredictionEngineIndexed import MovePredictionEngineIndexed
+from SharedEngineMemory import SharedEngineMemory, attach_base_weights
+
+"""
+Bulk scoring of game corpora, over a pool of processes.
+
+The games are split into chunks (work units) of chunk_size games. Each worker process holds one warm engine (a MovePredictionEngineIndexed,
+by default), and scores each game of its chunks on it, with reset() between games, so its arrays are reused rather than allocated per game.
+The base weights table is built once, and shared with the workers.
+Games are read from the corpus only as workers need more chunks, so a corpus can be streamed from a file of any size.
+
+score_corpus() yields (game index, final score) for each game: in corpus order, or (with ordered=False) as chunks finish,
+which keeps all workers busy when some chunks are slower than others.
+
+Run with: python BulkScorer.py games.jsonl --output scores.jsonl
+Each input line is a JSON list of move degrees, or an object with "degrees" (and any other fields, e.g. an id, copied to the output).
+"""
+
+# The base weights and engine type of this worker process, set by init_worker(), and its engine, created for its first game.
+WorkerBaseWeights = None
+WorkerEngineType = None
+WorkerEngine = None
+
+def init_worker(base_weights_name, state_count, engine_type):
+    global WorkerBaseWeights, WorkerEngineType
+    WorkerBaseWeights = attach_base_weights(base_weights_name, state_count)
+    WorkerEngineType = engine_type
+
+# The worker's engine, reset for a new game of history_depth_count (as in test_score_move_series(), the game's move count).
+def get_worker_engine(history_depth_count):
+    global WorkerEngine
+    if WorkerEngine is None:
+        WorkerEngine = WorkerEngineType(history_depth_count, WorkerBaseWeights)
+    else:
+        WorkerEngine.reset(history_depth_count)
+    return WorkerEngine
+
+# Scores one chunk of games, in a worker. Returns their final scores: NaN for games with no weighted moves,
+# and for games of fewer than 2 moves, as the engines need a history depth of at least 2.
+def score_chunk(games):
+    final_scores = [math.nan] * len(games)
+    for g, moves in enumerate(games):
+        if len(moves) >= 2:
+            engine = get_worker_engine(len(moves))
+            for degrees in moves:
+                engine.score_move(degrees)
+            final_scores[g] = engine.get_final_score()
+    return final_scores
+
+# Yields (game index, final score) for each game of games (an iterable of move degree lists), scored over worker_count processes.
+# progress, if given, is called with the number of games scored so far, after each chunk.
+# Each worker has up to 2 chunks queued, so the corpus is read ahead by only 2 * worker_count * chunk_size games.
+# engine_type is the MovePredictionEngineNumpy subclass the workers score with (it needs reset()).
+def score_corpus(games, worker_count=None, chunk_size=256, ordered=True, state_count=BaseMoveWeights.DefaultStateCount, progress=None,
+                 engine_type=MovePredictionEngineIndexed):
+    games = iter(games)
+    worker_count = worker_count or os.cpu_count()
+    with SharedEngineMemory() as shared, \
+         concurrent.futures.ProcessPoolExecutor(worker_count, initializer=init_worker, initargs=(shared.publish_base_weights(state_count), state_count, engine_type)) as executor:
+        max_queued = 2 * worker_count
+        queued = collections.deque()
+        first_index = 0
+        scored_count = 0
+
+        while True:
+            while len(queued) < max_queued:
+                chunk = list(itertools.islice(games, chunk_size))
+                if not chunk:
+                    break
+                queued.append((first_index, executor.submit(score_chunk, chunk)))
+                first_index += len(chunk)
+            if not queued:
+                break
+
+            if ordered:
+                chunk_index, future = queued.popleft()
+            else:
+                concurrent.futures.wait([future for chunk_index, future in queued], return_when=concurrent.futures.FIRST_COMPLETED)
+                chunk_index, future = next((chunk_index, future) for chunk_index, future in queued if future.done())
+                queued.remove((chunk_index, future))
+
+            final_scores = future.result()
+            yield from enumerate(final_scores, chunk_index)
+            scored_count += len(final_scores)
+            if progress is not None:
+                progress(scored_count)
+
+# Yields the move degrees of each game in JSON lines. Records that are objects are also kept in records (by game index), for their other fields.
+def read_games(lines, records):
+    for index, line in enumerate(line for line in lines if line.strip()):
+        record = json.loads(line)
+        if isinstance(record, dict):
+            records[index] = record
+            yield record["degrees"]
+        else:
+            yield record
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scores a corpus of games (JSON lines of move degrees), over a pool of processes.")
+    parser.add_argument("input", help="Games file, or - for stdin")
+    parser.add_argument("--output", default="-", help="Scores file (JSON lines), or - for stdout")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Games per work unit")
+    parser.add_argument("--unordered", action="store_true", help="Write scores as chunks finish, rather than in input order")
+    parser.add_argument("--state-count", type=int, default=BaseMoveWeights.DefaultStateCount)
+    parser.add_argument("--quiet", action="store_true", help="Don't report progress on stderr")
+    args = parser.parse_args()
+
+    input_file = sys.stdin if args.input == "-" else open(args.input)
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+    progress = None if args.quiet else (lambda count: print(f"\r{count} games scored", end="", file=sys.stderr, flush=True))
+
+    # The input records are kept until their game is scored, for copying their other fields to the output.
+    records = {}
+    with input_file, output_file:
+        for index, final_score in score_corpus(read_games(input_file, records), args.workers, args.chunk_size, not args.unordered, args.state_count, progress):
+            output = {key: value for key, value in records.pop(index, {}).items() if key != "degrees"}
+            output.update(index=index, score=None if math.isnan(final_score) else final_score)
+            output_file.write(json.dumps(output) + "\n")
+    if progress is not None:
+        print(file=sys.stderr)
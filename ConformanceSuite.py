@@ -0,0 +1,353 @@
+import argparse
+import concurrent.futures
+import copy
+import importlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+from EngineBackends import Backends, create_engine
+from MovePredictionEngine import BaseMoveWeights, DemoMoveSeries
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy, as_move
+
+"""
+Conformance suite for the engine backends (see EngineBackends.py): checks that each backend reproduces the reference engine's scores.
+
+Every backend plays the same seeded sequences as the pure Python reference, and is compared with it move by move
+(each move's score, pos_add and neg_add), and on each sequence's final score. A value conforms if it's within
+atol + rtol * |reference value|. For each backend, the report has the largest absolute and relative errors, per move and per final score,
+the count of sequences and moves out of tolerance, and the worst sequence (by index, which regenerates it with get_sequence()).
+The demo series are also checked against their known final scores (DemoScores), to 2 decimal places.
+
+Windowed and decaying engines have no reference to compare with. So each sequence is also played with a variant config (see get_variant()):
+plain, windowed (with a history depth below the move count, so the window slides) or decay, by every backend that takes its options,
+and compared with play_naive(), which rebuilds each move's prediction from scratch, from the pairs of Moves the weights should hold.
+That checks the windowed removals and decay's scaling and renormalizing, without sharing any of their code.
+
+Forks and snapshots are checked on the same variants (see check_forks()): the engine plays the first half of the sequence, then its forks
+(including forks of forks, and forks whose parent or child is dropped), and its snapshots (loaded from a buffer, and memory-mapped from a file),
+play the rest. Each must match a deepcopy() of the engine playing the rest.
+
+The sequences mix a few kinds, of 2 to max_moves moves each: uniformly random moves, random walks (small turns, like a relaxed scribble),
+steady turns (circles and spirals), and moves exactly on state boundaries (including 0 and 360 degrees).
+
+Run with: python ConformanceSuite.py --count 2000
+Backends registered by other modules are included with --plugin module_name (imported before the suite runs, and in each worker).
+"""
+
+# The final scores of DemoMoveSeries, as given in its comments.
+DemoScores = [3.0, 62.96, 39.65, 71.96, 127.48, 138.29]
+
+SequenceKinds = ("random", "walk", "steady", "boundary")
+
+VariantKinds = ("plain", "windowed", "decay")
+
+# The decays of the decay variants. With 0.003, the weight scale falls below RenormalizeWeightScale after 40 moves, so longer sequences are renormalized.
+DecayFactors = (0.003, 0.5, 0.9, 0.99)
+
+ForkCases = ("fork", "fork_of_fork", "dropped_parent", "dropped_child", "snapshot_buffer", "snapshot_mmap")
+
+# Generates sequence index of a suite. Each sequence has its own seed, so any one can be regenerated alone. Returns (kind, degrees).
+def get_sequence(seed, index, max_moves=60, state_count=BaseMoveWeights.DefaultStateCount):
+    rnd = random.Random(seed * 1000003 + index)
+    kind = SequenceKinds[index % len(SequenceKinds)]
+    move_count = rnd.randint(2, max_moves)
+    circular_range = BaseMoveWeights.CircularRange
+
+    if kind == "random":
+        degrees = [rnd.random() * circular_range for _ in range(move_count)]
+    elif kind == "walk":
+        degree = rnd.random() * circular_range
+        degrees = []
+        for _ in range(move_count):
+            degree = (degree + rnd.gauss(0, 30)) % circular_range
+            degrees.append(degree)
+    elif kind == "steady":
+        degree = rnd.random() * circular_range
+        turn = rnd.uniform(-60, 60)
+        turn_change = rnd.uniform(-3, 3)
+        degrees = []
+        for _ in range(move_count):
+            degree = (degree + turn + rnd.gauss(0, 2)) % circular_range
+            turn += turn_change
+            degrees.append(degree)
+    else:
+        degrees = [rnd.randint(0, state_count) * circular_range / state_count for _ in range(move_count)]
+    return kind, degrees
+
+# Plays degrees on a new engine of the backend. Returns each move's (score, pos_add, neg_add), as an (n, 3) array, and the final score.
+def play_sequence(backend, degrees, base_weights=None):
+    return play_engine(create_engine(backend, len(degrees), base_weights), degrees)
+
+def play_engine(engine, degrees):
+    moves = np.array([engine.score_move(degree) for degree in degrees], dtype=np.float64).reshape(-1, 3)
+    return moves, engine.get_final_score()
+
+# The variant config of sequence index: (kind, history depth, engine options). Each sequence has its own seed, as in get_sequence().
+def get_variant(seed, index, move_count):
+    rnd = random.Random(f"variant-{seed}-{index}")
+    kind = VariantKinds[(index // len(SequenceKinds)) % len(VariantKinds)]
+    if kind == "windowed":
+        return kind, rnd.randint(2, max(2, move_count - 1)), {"windowed": True}
+    if kind == "decay":
+        return kind, rnd.randint(2, move_count), {"decay": rnd.choice(DecayFactors)}
+    return kind, move_count, {}
+
+# Creates an engine of the backend, with engine options (windowed, or decay). Only MovePredictionEngineNumpy (and its subclasses) take options,
+# so with options, returns None for other backends.
+def create_variant_engine(backend, history_depth, options):
+    engine = create_engine(backend, history_depth)
+    if not options:
+        return engine
+    if not isinstance(engine, MovePredictionEngineNumpy):
+        return None
+    return type(engine)(history_depth, engine.base_weights, **options)
+
+# Plays degrees with a config's weights rebuilt from scratch for each move. Returns the same as play_sequence().
+#
+# Move j (with n_j = min(j, history_depth) Moves before it) adds move[j] x (move[j - 1 - d] + move[j - n_j + d]) to the weights at each depth d < n_j,
+# and move k's prediction is the sum over depths d < n_k of weights[d] @ move[k - 1 - d]. So each term is move[j] times a dot product of two Moves.
+# With decay, move j's terms are scaled by decay^(k - 1 - j). Windowed, only the terms between Moves still in move k's history (from move k - n_k) are kept.
+def play_naive(degrees, history_depth, windowed=False, decay=None):
+    scorer = MovePredictionEngineNumpy(history_depth)
+    moves = np.array([scorer.get_move_coefficients(degree) for degree in degrees])
+    dots = moves @ moves.T
+    counts = np.minimum(np.arange(len(degrees)), history_depth)
+    results = []
+    for k, degree in enumerate(degrees):
+        first = k - counts[k] if windowed else 0
+        pred = np.zeros(moves.shape[1])
+        for j in range(first, k):
+            d = np.arange(min(counts[j], counts[k]))
+            term = 0.0
+            for pairs in (j - 1 - d, j - counts[j] + d):
+                term += np.where(pairs >= first, dots[pairs, k - 1 - d], 0.0).sum()
+            pred += (term if decay is None else term * decay ** (k - 1 - j)) * moves[j]
+
+        # The scorer is only used for get_scoring_weight(), which scales scores by the history count after the move is recorded.
+        scorer.history_count = min(k + 1, history_depth)
+        score, pos_add, neg_add = scorer.get_scoring_weight(degree, as_move(pred))
+        scorer.pos_sum += pos_add
+        scorer.neg_sum += neg_add
+        results.append((score, pos_add, neg_add))
+    return np.array(results, dtype=np.float64).reshape(-1, 3), scorer.get_final_score()
+
+# The errors of values, compared with the reference values: the largest absolute and relative errors, and the number of values
+# (or for 2D values, e.g. each move's score, pos_add and neg_add, the number of rows) out of tolerance.
+def get_errors(values, reference, rtol, atol):
+    values = np.asarray(values, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    both_nan = np.isnan(values) & np.isnan(reference)
+    errors = np.where(both_nan, 0.0, np.abs(values - reference))
+    errors = np.where(np.isnan(errors), math.inf, errors)
+    # Relative to atol for reference values smaller than that, as a value of ~0 can't be matched to any relative precision.
+    relative_errors = errors / np.maximum(np.abs(np.nan_to_num(reference)), max(atol, np.finfo(np.float64).tiny))
+    failed = errors > atol + rtol * np.abs(np.nan_to_num(reference))
+    if failed.ndim > 1:
+        failed = failed.any(axis=1)
+    return float(errors.max(initial=0)), float(relative_errors.max(initial=0)), int(np.count_nonzero(failed))
+
+# Combines results of get_errors(), into the same errors over all their values.
+def combine_errors(*errors):
+    return max(e[0] for e in errors), max(e[1] for e in errors), sum(e[2] for e in errors)
+
+# Checks that copies of an engine that's played the first half of degrees play the rest the same as a deepcopy() of it.
+# Returns the errors of each of the ForkCases the backend has (as get_errors() returns them, over the moves and final scores of all the copies in the case):
+# all of them for engines with save(), the fork cases for other engines with fork(), and none for the rest (or for options the backend doesn't take).
+def check_forks(backend, degrees, history_depth, options, rtol, atol):
+    engine = create_variant_engine(backend, history_depth, options)
+    if engine is None or not hasattr(engine, "fork"):
+        return {}
+    split = len(degrees) // 2
+    play_engine(engine, degrees[:split])
+    rest = degrees[split:]
+    half = len(rest) // 2
+    expected_moves, expected_final = play_engine(copy.deepcopy(engine), rest)
+
+    # Plays moves start to end of the rest on engines, taking turns move by move (so each records moves while the others still share its weights).
+    # Returns their errors, including their final scores when they play to the end.
+    def play_in_turn(engines, start, end=None):
+        moves = np.array([[engine.score_move(degree) for engine in engines] for degree in rest[start:end]], dtype=np.float64).reshape(-1, len(engines), 3)
+        errors = [get_errors(moves[:, e], expected_moves[start:end], rtol, atol) for e in range(len(engines))]
+        if end is None:
+            errors += [get_errors([engine.get_final_score()], [expected_final], rtol, atol) for engine in engines]
+        return combine_errors(*errors)
+
+    results = {}
+    parent = copy.deepcopy(engine)
+    results["fork"] = play_in_turn([parent, parent.fork()], 0)
+
+    parent = copy.deepcopy(engine)
+    child = parent.fork()
+    before = play_in_turn([parent, child], 0, half)
+    results["fork_of_fork"] = combine_errors(before, play_in_turn([parent, child, child.fork()], half))
+
+    parent = copy.deepcopy(engine)
+    child = parent.fork()
+    before = play_in_turn([parent, child], 0, half)
+    del parent
+    results["dropped_parent"] = combine_errors(before, play_in_turn([child], half))
+
+    parent = copy.deepcopy(engine)
+    child = parent.fork()
+    before = play_in_turn([parent, child], 0, half)
+    del child
+    results["dropped_child"] = combine_errors(before, play_in_turn([parent], half))
+
+    if hasattr(engine, "save"):
+        buffer = io.BytesIO()
+        engine.save(buffer)
+        buffer.seek(0)
+        results["snapshot_buffer"] = play_in_turn([type(engine).load(buffer)], 0)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "engine.snapshot")
+            engine.save(path)
+            loaded = type(engine).load(path, mmap=True)
+            results["snapshot_mmap"] = play_in_turn([loaded, loaded.fork()], 0)
+    return results
+
+# Checks one sequence of the suite on each backend. Returns its kind, move count, and per backend:
+# (max move abs error, max move rel error, moves failed, final abs error, final rel error, final failed).
+# Then its variant kind, and the same errors of its variant, against play_naive(), for each backend (including the reference) that takes the variant's options.
+# And the errors of check_forks() on the variant, for each backend.
+def check_sequence(seed, index, max_moves, backends, rtol, atol):
+    kind, degrees = get_sequence(seed, index, max_moves)
+    reference_moves, reference_final = play_sequence("reference", degrees)
+    results = {}
+    for backend in backends:
+        moves, final_score = play_sequence(backend, degrees)
+        results[backend] = get_errors(moves, reference_moves, rtol, atol) + get_errors([final_score], [reference_final], rtol, atol)
+
+    variant_kind, history_depth, options = get_variant(seed, index, len(degrees))
+    naive_moves, naive_final = play_naive(degrees, history_depth, **options)
+    variant_results = {}
+    fork_results = {}
+    for backend in ["reference"] + backends:
+        engine = create_variant_engine(backend, history_depth, options)
+        if engine is not None:
+            moves, final_score = play_engine(engine, degrees)
+            variant_results[backend] = get_errors(moves, naive_moves, rtol, atol) + get_errors([final_score], [naive_final], rtol, atol)
+        fork_results[backend] = check_forks(backend, degrees, history_depth, options, rtol, atol)
+    return kind, len(degrees), results, variant_kind, variant_results, fork_results
+
+# Checks the final score of each demo series on the backend, to 2 decimal places. Returns the mismatches, as (demo index, score, expected).
+def check_demo_scores(backend):
+    mismatches = []
+    for d, (degrees, expected) in enumerate(zip(DemoMoveSeries, DemoScores)):
+        moves, final_score = play_sequence(backend, [float(degree) for degree in degrees])
+        if not round(final_score, 2) == expected:
+            mismatches.append((d, final_score, expected))
+    return mismatches
+
+def init_worker(plugins):
+    for plugin in plugins:
+        importlib.import_module(plugin)
+
+# Runs the suite: count seeded sequences on each backend (default: all registered, other than the reference), and returns the report.
+# The reference is checked on the variants (and demo series) only.
+# progress, if given, is called with the number of sequences checked so far.
+def run_suite(backends=None, seed=0, count=1000, max_moves=60, rtol=1e-9, atol=1e-9, worker_count=None, plugins=(), progress=None):
+    backends = [backend for backend in (backends or Backends) if backend != "reference"]
+    report = {backend: {
+        "sequences": 0, "moves": 0, "failed_sequences": 0, "failed_moves": 0, "failed_final_scores": 0,
+        "max_move_abs_error": 0.0, "max_move_rel_error": 0.0, "max_final_abs_error": 0.0, "max_final_rel_error": 0.0,
+        "worst_sequence": None, "failed_by_kind": {kind: 0 for kind in SequenceKinds},
+        "variant_sequences": 0, "failed_variant_sequences": 0, "max_variant_abs_error": 0.0, "max_variant_rel_error": 0.0,
+        "failed_variants_by_kind": {kind: 0 for kind in VariantKinds},
+        "fork_cases": 0, "failed_fork_cases": 0, "max_fork_abs_error": 0.0, "max_fork_rel_error": 0.0,
+        "failed_forks_by_case": {case: 0 for case in ForkCases},
+    } for backend in ["reference"] + backends}
+
+    worker_count = worker_count or os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(worker_count, initializer=init_worker, initargs=(tuple(plugins),)) as executor:
+        checks = executor.map(check_sequence, [seed] * count, range(count), [max_moves] * count, [backends] * count, [rtol] * count, [atol] * count,
+                              chunksize=max(1, count // (8 * worker_count)))
+        worst_errors = {backend: -1.0 for backend in backends}
+        for index, (kind, move_count, results, variant_kind, variant_results, fork_results) in enumerate(checks):
+            for backend, (move_abs, move_rel, moves_failed, final_abs, final_rel, final_failed) in results.items():
+                entry = report[backend]
+                entry["sequences"] += 1
+                entry["moves"] += move_count
+                entry["failed_moves"] += moves_failed
+                entry["failed_final_scores"] += final_failed
+                if moves_failed or final_failed:
+                    entry["failed_sequences"] += 1
+                    entry["failed_by_kind"][kind] += 1
+                entry["max_move_abs_error"] = max(entry["max_move_abs_error"], move_abs)
+                entry["max_move_rel_error"] = max(entry["max_move_rel_error"], move_rel)
+                entry["max_final_abs_error"] = max(entry["max_final_abs_error"], final_abs)
+                entry["max_final_rel_error"] = max(entry["max_final_rel_error"], final_rel)
+                if max(move_abs, final_abs) > worst_errors[backend]:
+                    worst_errors[backend] = max(move_abs, final_abs)
+                    entry["worst_sequence"] = {"index": index, "kind": kind, "moves": move_count, "abs_error": worst_errors[backend]}
+            for backend, (move_abs, move_rel, moves_failed, final_abs, final_rel, final_failed) in variant_results.items():
+                entry = report[backend]
+                entry["variant_sequences"] += 1
+                if moves_failed or final_failed:
+                    entry["failed_variant_sequences"] += 1
+                    entry["failed_variants_by_kind"][variant_kind] += 1
+                entry["max_variant_abs_error"] = max(entry["max_variant_abs_error"], move_abs, final_abs)
+                entry["max_variant_rel_error"] = max(entry["max_variant_rel_error"], move_rel, final_rel)
+            for backend, cases in fork_results.items():
+                entry = report[backend]
+                for case, (abs_error, rel_error, failed) in cases.items():
+                    entry["fork_cases"] += 1
+                    if failed:
+                        entry["failed_fork_cases"] += 1
+                        entry["failed_forks_by_case"][case] += 1
+                    entry["max_fork_abs_error"] = max(entry["max_fork_abs_error"], abs_error)
+                    entry["max_fork_rel_error"] = max(entry["max_fork_rel_error"], rel_error)
+            if progress is not None:
+                progress(index + 1)
+
+    for backend in ["reference"] + backends:
+        mismatches = check_demo_scores(backend)
+        report[backend]["demo_mismatches"] = [{"demo": d, "score": score, "expected": expected} for d, score, expected in mismatches]
+    for entry in report.values():
+        entry["conforms"] = not (entry["failed_sequences"] or entry["failed_variant_sequences"] or entry["failed_fork_cases"] or entry["demo_mismatches"])
+
+    return {"settings": {"seed": seed, "count": count, "max_moves": max_moves, "rtol": rtol, "atol": atol}, "backends": report}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks that each engine backend reproduces the reference engine's scores, on seeded sequences.")
+    parser.add_argument("--backends", nargs="+", help="Backends to check (default: all registered)")
+    parser.add_argument("--plugin", action="append", default=[], help="Module to import, which registers more backends")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=1000, help="Number of sequences")
+    parser.add_argument("--max-moves", type=int, default=60, help="Longest sequence (the reference engine is slow on long sequences)")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=1e-9)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    for plugin in args.plugin:
+        importlib.import_module(plugin)
+    unknown = [backend for backend in args.backends or [] if backend not in Backends]
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(unknown)}")
+
+    progress = lambda count: print(f"\r{count} sequences checked", end="", file=sys.stderr, flush=True)
+    report = run_suite(args.backends, args.seed, args.count, args.max_moves, args.rtol, args.atol, args.workers, args.plugin, progress)
+    print(file=sys.stderr)
+
+    for backend, entry in report["backends"].items():
+        checks = f"  failed variants {entry['failed_variant_sequences']}/{entry['variant_sequences']} (max error {entry['max_variant_abs_error']:.3g})"
+        if entry["fork_cases"]:
+            checks += f"  forks {entry['failed_fork_cases']}/{entry['fork_cases']} (max error {entry['max_fork_abs_error']:.3g})"
+        if backend == "reference":
+            print(f"{backend:>10} {'ok' if entry['conforms'] else 'FAIL'}{checks}  demo mismatches {len(entry['demo_mismatches'])}")
+            continue
+        print(f"{backend:>10} {'ok' if entry['conforms'] else 'FAIL'}  failed sequences {entry['failed_sequences']}/{entry['sequences']}"
+              f"  moves {entry['failed_moves']}/{entry['moves']}  max move error {entry['max_move_abs_error']:.3g} (rel {entry['max_move_rel_error']:.3g})"
+              f"  max final error {entry['max_final_abs_error']:.3g}{checks}  demo mismatches {len(entry['demo_mismatches'])}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if all(entry["conforms"] for entry in report["backends"].values()) else 1)
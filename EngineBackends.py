@@ -0,0 +1,56 @@
+import numpy as np
+
+from MovePredictionEngine import MovePredictionEngine, MoveScoring
+from MovePredictionEngineBatch import MovePredictionEngineBatch
+from MovePredictionEngineFourier import MovePredictionEngineFourier
+from MovePredictionEngineIndexed import MovePredictionEngineIndexed
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy
+from MovePredictionEngineThreaded import MovePredictionEngineThreaded
+
+"""
+Registry of the engine backends: the implementations that should all give the reference engine's scores.
+
+Each backend is registered by name, with a function create_engine(history_depth_count, base_weights) that returns an engine
+with score_move(degrees) (returning score, pos_add and neg_add) and get_final_score(), as MovePredictionEngine has.
+The conformance suite (ConformanceSuite.py) checks every registered backend against "reference", and Benchmark.py benchmarks them.
+
+A new backend is added with register_backend(), e.g. from its own module:
+    register_backend("mine", lambda history_depth_count, base_weights=None: MyEngine(history_depth_count, base_weights))
+Approximate configurations (e.g. a truncated Fourier basis, or decay) don't give the reference scores, so they aren't registered here.
+"""
+
+# The registered backends, by name, in registration order.
+Backends = {}
+
+def register_backend(name, create_engine):
+    if name in Backends:
+        raise ValueError(f"Backend {name!r} is already registered")
+    Backends[name] = create_engine
+
+def create_engine(name, history_depth_count, base_weights=None):
+    create = Backends.get(name)
+    if create is None:
+        raise ValueError(f"Unknown backend {name!r}, expected one of: {', '.join(Backends)}")
+    return create(history_depth_count, base_weights)
+
+# A single game of a MovePredictionEngineBatch, with the per-move interface of the other engines. For checking (and timing) the batched code move by move.
+class MovePredictionEngineBatchGame(MoveScoring):
+    def __init__(self, history_depth_count, base_weights=None):
+        self.engine = MovePredictionEngineBatch(1, history_depth_count, base_weights=base_weights)
+        self.pos_sum = 0
+        self.neg_sum = 0
+
+    # The predicted Move is the game's (1, StateCount) row of the batched prediction.
+    def record_move_and_get_predicted(self, degrees):
+        return self.engine.record_moves_and_get_predicted(np.array([degrees], dtype=np.float64))
+
+    def get_scoring_weight(self, degrees, predicted):
+        scores, pos_adds, neg_adds = self.engine.get_scoring_weights(np.array([degrees], dtype=np.float64), predicted)
+        return float(scores[0]), float(pos_adds[0]), float(neg_adds[0])
+
+register_backend("reference", MovePredictionEngine)
+register_backend("numpy", MovePredictionEngineNumpy)
+register_backend("indexed", MovePredictionEngineIndexed)
+register_backend("fourier", MovePredictionEngineFourier)
+register_backend("threaded", MovePredictionEngineThreaded)
+register_backend("batch", MovePredictionEngineBatchGame)
@@ -0,0 +1,161 @@
+import collections
+import time
+
+import numpy as np
+
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy
+
+"""
+Opt-in instrumentation of an engine's per-move phases, for finding where the time goes in production.
+
+instrument(engine) wraps the engine's phase methods on that instance only, with timers. It doesn't change the engine classes,
+so an engine that isn't instrumented runs exactly the same code as before, with no cost at all. remove() restores the instance.
+Each engine is one session (e.g. one drawing), so its stats are that session's.
+
+The phases:
+- get_move: getting the new move's Move (or its coefficients).
+- predict: accumulating the prediction over all depths.
+- update: the rank-1 weight updates (and windowed removals).
+- score: get_scoring_weight().
+- record: the rest of recording a move (e.g. the history insert, and expanding the prediction to states).
+The reference engine computes the prediction and the weight update in one fused loop, so it has a predict_and_update phase instead.
+
+Timings are self times: a phase that calls another (e.g. record calls predict) doesn't include it, so the phases sum to the total.
+Each move's latency (from the start of score_move(), or record_move_and_get_predicted(), to the end of its scoring) is also kept.
+get_stats() returns a plain dict, for pulling from a metrics endpoint: per phase, the call count, total time, and mean, p50, p99
+and max latencies, from the most recent sample_count calls (the same as the ScoringDaemon's request latencies).
+"""
+
+# The methods timed for each phase, for the reference engine and MovePredictionEngineNumpy (and its subclasses).
+# Methods an engine doesn't have are skipped, so other engines (e.g. the batch game backend) get what applies to them.
+ReferencePhases = {
+    "get_move": "get_move",
+    "record_move_and_get_predicted": "predict_and_update",
+    "record_move": "predict_and_update",
+    "get_scoring_weight": "score",
+}
+NumpyPhases = {
+    "get_move_coefficients": "get_move",
+    "get_prediction": "predict",
+    "record_contributions": "predict",
+    "update_weights": "update",
+    "remove_oldest_terms": "update",
+    "record_move_and_get_predicted": "record",
+    "record_move": "record",
+    "record_moves": "record",
+    "get_scoring_weight": "score",
+}
+
+# The methods that start a move, for the per-move latencies. When one calls another (score_move() records the move), only the outer one counts.
+MoveMethods = ("score_move", "record_move_and_get_predicted", "record_move")
+
+def instrument(engine, sample_count=10000):
+    return EngineInstrumentation(engine, sample_count)
+
+class PhaseStats:
+    def __init__(self, sample_count):
+        self.calls = 0
+        self.total = 0.0
+        self.samples = collections.deque(maxlen=sample_count)
+
+    def add(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        self.samples.append(elapsed)
+
+    def clear(self):
+        self.calls = 0
+        self.total = 0.0
+        self.samples.clear()
+
+    def get_stats(self):
+        stats = {"calls": self.calls, "total_ms": self.total * 1000}
+        if self.samples:
+            samples = np.array(self.samples) * 1000
+            stats.update(mean_ms=float(samples.mean()), p50_ms=float(np.percentile(samples, 50)),
+                         p99_ms=float(np.percentile(samples, 99)), max_ms=float(samples.max()))
+        return stats
+
+class EngineInstrumentation:
+    def __init__(self, engine, sample_count=10000):
+        if getattr(engine, "instrumentation", None) is not None:
+            raise ValueError("Engine is already instrumented")
+        self.engine = engine
+        self.sample_count = sample_count
+        self.phases = {}
+        self.moves = PhaseStats(sample_count)
+
+        # The time spent in timed calls made by the current call, so it can be left out of the current call's self time.
+        self.child_time = 0.0
+        self.in_move = False
+
+        phases = NumpyPhases if isinstance(engine, MovePredictionEngineNumpy) else ReferencePhases
+        self.wrapped = []
+        for name in dict.fromkeys(list(phases) + list(MoveMethods)):
+            if hasattr(engine, name):
+                self.wrap(name, phases.get(name))
+        self.wrap_fork()
+        engine.instrumentation = self
+
+    # Shadows the engine's method with a timed one, on the instance.
+    def wrap(self, name, phase):
+        method = getattr(self.engine, name)
+        stats = None if phase is None else self.phases.setdefault(phase, PhaseStats(self.sample_count))
+        is_move = name in MoveMethods
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            outer_child_time = self.child_time
+            self.child_time = 0.0
+            starts_move = is_move and not self.in_move
+            if starts_move:
+                self.in_move = True
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                if stats is not None:
+                    stats.add(elapsed - self.child_time)
+                if starts_move:
+                    self.in_move = False
+                    self.moves.add(elapsed)
+                self.child_time = outer_child_time + elapsed
+
+        setattr(self.engine, name, timed)
+        self.wrapped.append(name)
+
+    # Forks are copies of the instance, so they'd get its timed methods (timing the original engine). They're returned uninstrumented instead.
+    def wrap_fork(self):
+        if not hasattr(self.engine, "fork"):
+            return
+        fork_engine = self.engine.fork
+
+        def fork():
+            fork = fork_engine()
+            for name in self.wrapped:
+                fork.__dict__.pop(name, None)
+            fork.__dict__.pop("instrumentation", None)
+            return fork
+
+        self.engine.fork = fork
+        self.wrapped.append("fork")
+
+    # Restores the engine's own methods.
+    def remove(self):
+        for name in self.wrapped:
+            self.engine.__dict__.pop(name, None)
+        self.wrapped = []
+        self.engine.__dict__.pop("instrumentation", None)
+
+    def reset(self):
+        for stats in self.phases.values():
+            stats.clear()
+        self.moves.clear()
+
+    def get_stats(self):
+        return {
+            "engine": type(self.engine).__name__,
+            "moves": self.moves.get_stats(),
+            "phases": {phase: stats.get_stats() for phase, stats in self.phases.items()},
+        }
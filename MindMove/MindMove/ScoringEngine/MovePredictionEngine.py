@@ -1,5 +1,8 @@
+import collections
+import copy
 import math
 import random
+from array import array
 
 """
 This engine predicts moves in a 360 degree range, based on best fit to the existing move sequence,
@@ -46,7 +49,10 @@ Notes
 - An emergent property is that varying change in relative angle, between moves, is the key to high scores.
 - It detects both local and global patterns of movement, by accounting for the entire history each move. 
 """
+# Moves have __slots__, for no per-Move __dict__. The engine's weights aren't Moves (see MovePredictionEngine.own_depth_weights()).
 class Move:
+    __slots__ = ("states",)
+
     def __init__(self, num_states):
         self.states = [0.0] * num_states
 
@@ -66,46 +72,138 @@ class BaseMoveWeights:
     #
     # For 1000 randomized 80-move games, the mean difference for 30 vs. 60 states = 1.86, StdDev = 1.48. 95% upper-bound CI = 4.76.
     #
+    # These can be reproduced (e.g. at other game lengths) with StateCountStudy.py.
+    #
     # Note the core loop calculations could be parallelized, making it faster, enabling a higher StateCount.
-    StateCount = 30
-    BaseDiffPerState = 4.0 / StateCount
-
-    MoveWeights = []
-    SumMoveWeights = 0
+    DefaultStateCount = 30
 
     # The 360 degree range is virtualized to a smooth (infinte continuous) gradient, from 0 to 360.0 (and wraps around at 360.0). 
     CircularRange = 360.0
 
-    @staticmethod
-    def get_index_at_offset(t, offset):
-        x = t + offset
-        return x - (BaseMoveWeights.StateCount * (x // BaseMoveWeights.StateCount))
+    # One instance per StateCount, shared by all engines using it. See get().
+    Cache = {}
 
-    @staticmethod
-    def initialize():
-        for t in range(BaseMoveWeights.StateCount):
-            move = Move(BaseMoveWeights.StateCount)
+    def __init__(self, state_count=DefaultStateCount):
+        # Attributes are set through vars(), as __setattr__ is blocked.
+        vars(self).update(StateCount=state_count, BaseDiffPerState=4.0 / state_count)
 
-            for j in range(BaseMoveWeights.StateCount // 2 + 1):
+        move_weights = []
+        for t in range(state_count):
+            move = Move(state_count)
+
+            for j in range(state_count // 2 + 1):
                 # The weight at t = 1, weight at opposite of t = -1. Then, a gradient in between.
                 # It creates a circle of symmetrical state weights, which sum to 0.
-                weight = 1 - (BaseMoveWeights.BaseDiffPerState * j)
-                move.states[BaseMoveWeights.get_index_at_offset(t, j)] = weight
-                move.states[BaseMoveWeights.get_index_at_offset(t, -j)] = weight
+                weight = 1 - (self.BaseDiffPerState * j)
+                move.states[self.get_index_at_offset(t, j)] = weight
+                move.states[self.get_index_at_offset(t, -j)] = weight
+
+            move.states = tuple(move.states)
+            move_weights.append(move)
+
+        sum_move_weights = 0
+        for j in range(state_count):
+            sum_move_weights += abs(move_weights[0].states[j])
+
+        vars(self).update(MoveWeights=tuple(move_weights), SumMoveWeights=sum_move_weights)
+
+    # Builds the BaseMoveWeights from an existing table of states (one row per state), rather than computing it. E.g. a table shared between processes.
+    # The rows are used as the MoveWeights states, without copying.
+    @staticmethod
+    def from_table(table):
+        base_weights = BaseMoveWeights.__new__(BaseMoveWeights)
+        move_weights = []
+        for row in table:
+            move = Move.__new__(Move)
+            move.states = row
+            move_weights.append(move)
+
+        sum_move_weights = 0
+        for state in table[0]:
+            sum_move_weights += abs(state)
+
+        vars(base_weights).update(StateCount=len(table), BaseDiffPerState=4.0 / len(table), MoveWeights=tuple(move_weights), SumMoveWeights=sum_move_weights)
+        return base_weights
+
+    # The tables are shared between engines (and threads), so they can't be changed after they're built.
+    def __setattr__(self, name, value):
+        raise AttributeError("BaseMoveWeights can't be changed, as they're shared between engines")
+
+    # Gets the BaseMoveWeights for state_count, building them only the first time.
+    @staticmethod
+    def get(state_count=DefaultStateCount):
+        base_weights = BaseMoveWeights.Cache.get(state_count)
+        if base_weights is None:
+            base_weights = BaseMoveWeights.Cache.setdefault(state_count, BaseMoveWeights(state_count))
+        return base_weights
 
-            BaseMoveWeights.MoveWeights.append(move)
+    def get_index_at_offset(self, t, offset):
+        x = t + offset
+        return x - (self.StateCount * (x // self.StateCount))
+
+# The final score of a game, from its pos and neg sums. Range is 0 to 200. Scores are symmetrical around 100 (where pos_sum = neg_sum).
+# NaN until a move has been scored with any weight.
+def get_final_score(pos_sum, neg_sum):
+    if pos_sum < neg_sum:
+        return (pos_sum / neg_sum) * 100
+    if pos_sum > 0:
+        return (2 - (neg_sum / pos_sum)) * 100
+    return math.nan
+
+# The move scoring shared by the engines: keeping the pos and neg sums of a game, and its final score.
+# An engine sets pos_sum and neg_sum to 0, and has record_move_and_get_predicted() and get_scoring_weight().
+class MoveScoring:
+    # Records a move, scores it against its prediction, and adds to the engine's pos and neg sums. Returns the same as get_scoring_weight().
+    def score_move(self, degrees):
+        score, pos_add, neg_add = self.get_scoring_weight(degrees, self.record_move_and_get_predicted(degrees))
+        self.pos_sum += pos_add
+        self.neg_sum += neg_add
+        return score, pos_add, neg_add
+
+    # The final score (from 0 to 200) of the moves scored by score_move() so far. See get_final_score() above.
+    def get_final_score(self):
+        return get_final_score(self.pos_sum, self.neg_sum)
+
+    # Scores moves as they arrive from an iterable (e.g. live input), without buffering the game.
+    # Yields the score, pos_add and neg_add of each move, and the running final score.
+    def stream_scores(self, degrees):
+        for degree in degrees:
+            score, pos_add, neg_add = self.score_move(degree)
+            yield score, pos_add, neg_add, self.get_final_score()
 
-        for j in range(BaseMoveWeights.StateCount):
-            BaseMoveWeights.SumMoveWeights += abs(BaseMoveWeights.MoveWeights[0].states[j])
+    # Scores a whole game, with a history depth of its move count, and returns the final score.
+    @classmethod
+    def test_score_move_series(cls, degrees, base_weights=None):
+        engine = cls(len(degrees), base_weights)
+        for degree in degrees:
+            engine.score_move(degree)
+        return engine.get_final_score()
 
-BaseMoveWeights.initialize()
+    # Test function that simulates a 'game' of moveCount random moves, and returns the final score.
+    # The score average converges to 100 over multiple 'games'. 
+    # seed, if given, makes the game repeatable (e.g. for benchmarks).
+    @classmethod
+    def test_score_random_moves(cls, move_count=300, base_weights=None, seed=None):
+        rnd = random.Random(seed)
+        degrees = [rnd.random() * BaseMoveWeights.CircularRange for _ in range(move_count)]
+        return cls.test_score_move_series(degrees, base_weights)
 
 # Engine for prediciting circular moves, and scoring actual moves based on the predicted.
-class MovePredictionEngine:
-    def __init__(self, history_depth_count):
+# base_weights sets the StateCount. It defaults to BaseMoveWeights.get(), i.e. 30 states.
+class MovePredictionEngine(MoveScoring):
+    def __init__(self, history_depth_count, base_weights=None):
+        self.base_weights = base_weights if base_weights is not None else BaseMoveWeights.get()
         self.history_depth = history_depth_count
         self.history = []
+
+        # The weights of each depth are one flat array of doubles, StateCount rows of StateCount states (row i is the weights for the predicted state i),
+        # rather than StateCount Moves of boxed floats. That's 8 bytes per weight, instead of a float object and its list slot (32 bytes),
+        # and one object per depth, instead of a list of StateCount Moves, each with its own list.
+        # A depth's array is allocated when the history first reaches it. See own_depth_weights().
         self.weights = []
+        self.weight_rows = [range(i * self.base_weights.StateCount, (i + 1) * self.base_weights.StateCount) for i in range(self.base_weights.StateCount)]
+        # The depths whose weights are shared with a fork. See fork().
+        self.shared_depths = set()
 
         # This is the other significant heuristic. Scoring still works well without this, usually giving similar results.
         #
@@ -117,34 +215,164 @@ class MovePredictionEngine:
         self.scoreScaler = (1.0 / math.log(self.history_depth)); # In get_scoring_weight(), we use moveCount^scoreScaler as a multiplier. 
         self.ScoreScalerMiddle = math.pow(self.history_depth / 2.0, self.scoreScaler)
 
-        for d in range(self.history_depth):
-            self.weights.append([Move(BaseMoveWeights.StateCount) for _ in range(BaseMoveWeights.StateCount)])
+        # The sums of the pos_adds and neg_adds of moves scored with score_move(), for get_final_score().
+        self.pos_sum = 0
+        self.neg_sum = 0
+
+        # Total moves recorded, and (if tracked) the contributions of each history Move to each move's prediction. See track_contributions().
+        self.move_count = 0
+        self.contributions = None
 
     # Given the directional degrees (from 0 to 1.0) of a 'move', records a Move, and gets the 'predicted' Move.
     # Note the predicted Move need not have a smooth weight distribution, however it will be symmetrical.
     def record_move_and_get_predicted(self, degrees):
+        state_count = self.base_weights.StateCount
         move = self.get_move(degrees)
-        pred = Move(BaseMoveWeights.StateCount)
+        pred = Move(state_count)
 
         # This is the core loop that calculates the predicted Move, and updates weights based on the new Move. 
         # Note the value caching outside the inner-most operations is for performance only.
+        # The inner-most loop over j iterates the states with zip(), and the weights at k (row i, state j) are updated in place.
+        # The operations, and their order, are the same as pred.states[i] += hist_move.states[j] * move_weights_i.states[j], and
+        # move_weights_i.states[j] += (move_state_i * hist_move.states[j]) + (move_state_i * hist_move_reverse.states[j]).
+        pred_states = pred.states
+        states = range(state_count)
+        rows = self.weight_rows
+        # While contributions are tracked, each depth's term of the prediction is also summed on its own, for record_contributions().
+        by_depth = None if self.contributions is None else []
         for d in range(len(self.history)):
-            hist_move = self.history[d]
-            hist_move_reverse = self.history[(self.history.__len__() - 1) - d]
-            move_weights = self.weights[d]
-            for i in range(BaseMoveWeights.StateCount):
-                move_weights_i = move_weights[i]
+            hist_states = self.history[d].states
+            hist_reverse_states = self.history[(self.history.__len__() - 1) - d].states
+            move_weights = self.own_depth_weights(d)
+            depth_states = None if by_depth is None else [0.0] * state_count
+            for i in states:
                 move_state_i = move.states[i]
-                for j in range(BaseMoveWeights.StateCount):
-                    pred.states[i] += hist_move.states[j] * move_weights_i.states[j]
-                    move_weights_i.states[j] += (move_state_i * hist_move.states[j]) + (move_state_i * hist_move_reverse.states[j])
-
+                pred_state_i = pred_states[i]
+                if depth_states is None:
+                    for k, hist_state_j, hist_reverse_state_j in zip(rows[i], hist_states, hist_reverse_states):
+                        weight_j = move_weights[k]
+                        pred_state_i += hist_state_j * weight_j
+                        move_weights[k] = weight_j + ((move_state_i * hist_state_j) + (move_state_i * hist_reverse_state_j))
+                else:
+                    depth_state_i = 0.0
+                    for k, hist_state_j, hist_reverse_state_j in zip(rows[i], hist_states, hist_reverse_states):
+                        weight_j = move_weights[k]
+                        term = hist_state_j * weight_j
+                        pred_state_i += term
+                        depth_state_i += term
+                        move_weights[k] = weight_j + ((move_state_i * hist_state_j) + (move_state_i * hist_reverse_state_j))
+                    depth_states[i] = depth_state_i
+                pred_states[i] = pred_state_i
+            if by_depth is not None:
+                by_depth.append(depth_states)
+
+        if by_depth is not None:
+            self.record_contributions(degrees, by_depth)
         self.history.insert(0, move)
         if len(self.history) > self.history_depth:
             self.history.pop()
+        self.move_count += 1
 
         return pred
 
+    # Records a Move, the same as record_move_and_get_predicted(), but faster because it doesn't fill out the predicted Move.
+    # Used for seeding an engine with moves from a prior game (as in 'Continuity').
+    # When contributions are tracked, the prediction is still needed for them, so there's no saving.
+    def record_move(self, degrees):
+        if self.contributions is not None:
+            self.record_move_and_get_predicted(degrees)
+            return
+
+        state_count = self.base_weights.StateCount
+        move = self.get_move(degrees)
+
+        rows = self.weight_rows
+        for d in range(len(self.history)):
+            hist_states = self.history[d].states
+            hist_reverse_states = self.history[(self.history.__len__() - 1) - d].states
+            move_weights = self.own_depth_weights(d)
+            for i in range(state_count):
+                move_state_i = move.states[i]
+                for k, hist_state_j, hist_reverse_state_j in zip(rows[i], hist_states, hist_reverse_states):
+                    move_weights[k] = move_weights[k] + ((move_state_i * hist_state_j) + (move_state_i * hist_reverse_state_j))
+
+        self.history.insert(0, move)
+        if len(self.history) > self.history_depth:
+            self.history.pop()
+        self.move_count += 1
+
+    def record_moves(self, degrees):
+        for degree in degrees:
+            self.record_move(degree)
+
+    # The weights at depth d, for updating in place. They're allocated (as zeros) when the history first reaches depth d,
+    # and copied first if they're still shared with a fork.
+    def own_depth_weights(self, d):
+        if d == len(self.weights):
+            self.weights.append(array("d", bytes(8 * self.base_weights.StateCount * self.base_weights.StateCount)))
+        elif d in self.shared_depths:
+            self.weights[d] = array("d", self.weights[d])
+            self.shared_depths.discard(d)
+        return self.weights[d]
+
+    # Starts tracking how much each history Move contributes to the prediction of each following move, for get_contributing_weights().
+    #
+    # The C# MovePredictionEngineExt.GetContributingWeights() gets these by replaying the whole history with fresh weights, which is O(n^3 * StateCount^2).
+    # But the contribution of history[d] to a prediction is just the depth d term of the prediction sum, weights[d] x history[d].
+    # So while tracking, the core loop also sums each depth's term on its own, and each term is scored against the actual move, as it's played.
+    # That's O(n * StateCount) extra per move (plus a second sum in the core loop), and the scores of targets still in the history are kept.
+    def track_contributions(self):
+        self.contributions = collections.deque(maxlen=self.history_depth)
+
+    # Scores each depth's term of the prediction (by_depth[d], for history[d]) against the actual move.
+    # Scores are kept without the move count scaler, which get_contributing_weights() applies.
+    def record_contributions(self, degrees, by_depth):
+        t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
+        t2 = self.base_weights.get_index_at_offset(t, 1)
+        scores = []
+        for depth_states in by_depth:
+            sum_states = sum(abs(s) for s in depth_states)
+            score = 0.0
+            if sum_states > 0:
+                score = (((depth_states[t] * t1_weight) + (depth_states[t2] * t2_weight)) / sum_states) * self.base_weights.SumMoveWeights
+            scores.append(score)
+        # Reversed, so scores are in chronological order of the history Moves: scores[-1] is for the previous move.
+        scores.reverse()
+        self.contributions.append((self.move_count, scores))
+
+    # The contributing weight of each Move in the history (oldest first, the same as the C# version), to the predictions of moves_of_interest.
+    # moves_of_interest are indexes into the history, oldest first. If None, contributions to all moves in the history are summed.
+    # Only contributions to moves recorded since track_contributions() are included.
+    def get_contributing_weights(self, moves_of_interest=None):
+        first = self.move_count - len(self.history)
+        targets = None if moves_of_interest is None else set(first + x for x in moves_of_interest)
+
+        weights = [0.0] * self.history_depth
+        for target, scores in self.contributions or ():
+            if target < first or (targets is not None and target not in targets):
+                continue
+            start = max(target - len(scores), first)
+            offset = start - (target - len(scores))
+            for k in range(target - start):
+                weights[start - first + k] += scores[offset + k]
+
+        # Scaled and negated the same as the score from get_scoring_weight().
+        scaler = -(math.pow(len(self.history), self.scoreScaler) / self.ScoreScalerMiddle)
+        return [weight * scaler for weight in weights]
+
+    # Returns a copy of the engine, e.g. to try out candidate moves, without changing this engine.
+    # Each depth's weights are shared rather than copied, and copied only when either engine first updates them (see own_depth_weights()).
+    # The history's states are never changed. So a fork costs a few lists of history_depth items, and its weights are copied as its moves update them.
+    def fork(self):
+        fork = copy.copy(self)
+        fork.history = list(self.history)
+        fork.weights = list(self.weights)
+        self.shared_depths = set(range(len(self.weights)))
+        fork.shared_depths = set(self.shared_depths)
+        if self.contributions is not None:
+            fork.contributions = collections.deque(self.contributions, maxlen=self.history_depth)
+        return fork
+
     # Get a score, given the actual 'move' direction, and the predicted Move.
     def get_scoring_weight(self, degrees, predicted):
         t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
@@ -154,7 +382,7 @@ class MovePredictionEngine:
         sum_states = sum(abs(s) for s in predicted.states)
         if sum_states > 0:
             # Scores are typically between -1 and 1, though can be outside this range.
-            score = (((predicted.states[t] * t1_weight) + (predicted.states[BaseMoveWeights.get_index_at_offset(t, 1)] * t2_weight)) / sum_states) * BaseMoveWeights.SumMoveWeights
+            score = (((predicted.states[t] * t1_weight) + (predicted.states[self.base_weights.get_index_at_offset(t, 1)] * t2_weight)) / sum_states) * self.base_weights.SumMoveWeights
 
             # Note that using just the raw score still works OK (i.e. score > 0 ? neg_add += score : pos_add -= score).
             # The below essentially makes the impact of 'draws' (e.g. scores near 0) equal to 'wins' and 'losses' (high or low scores).
@@ -163,7 +391,7 @@ class MovePredictionEngine:
             max_state = max(predicted.states)
             min_state = min(predicted.states)
             max_abs = max(max_state, abs(min_state))
-            score_range_normalizer = (max_abs / sum_states) * BaseMoveWeights.SumMoveWeights 
+            score_range_normalizer = (max_abs / sum_states) * self.base_weights.SumMoveWeights 
             neg_add = (score_range_normalizer + score)
             pos_add = (score_range_normalizer - score)
 
@@ -174,53 +402,48 @@ class MovePredictionEngine:
 
         return -score, pos_add, neg_add # Negative, so the caller can treat positive values as positive scores. 
 
+    # The get_scoring_weight() results for each of a list of candidate degrees, against one predicted Move, as lists of scores, pos_adds and neg_adds.
+    # E.g. for choosing the best, or worst, next move. The prediction's sum and max abs state are computed once, for all the candidates.
+    def score_candidates(self, predicted, degrees):
+        states = predicted.states
+        sum_states = sum(abs(s) for s in states)
+        if sum_states == 0:
+            return [0] * len(degrees), [0] * len(degrees), [0] * len(degrees)
+
+        max_abs = max(max(states), abs(min(states)))
+        score_range_normalizer = (max_abs / sum_states) * self.base_weights.SumMoveWeights
+        scaler = math.pow(len(self.history), self.scoreScaler)
+
+        scores, pos_adds, neg_adds = [], [], []
+        for degree in degrees:
+            t, t1_weight, t2_weight = self.get_target_state_and_weights(degree)
+            score = (((states[t] * t1_weight) + (states[self.base_weights.get_index_at_offset(t, 1)] * t2_weight)) / sum_states) * self.base_weights.SumMoveWeights
+            neg_adds.append((score_range_normalizer + score) * scaler)
+            pos_adds.append((score_range_normalizer - score) * scaler)
+            scores.append(-(score * (scaler / self.ScoreScalerMiddle)))
+        return scores, pos_adds, neg_adds
+
     def get_move(self, degrees):
         # First get the Move set up with base state values
+        base_weights = self.base_weights
         t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
-        base_move = BaseMoveWeights.MoveWeights[t]
+        base_move = base_weights.MoveWeights[t]
 
         # Now virtualize the weights to match the 360 degree range
-        move = Move(BaseMoveWeights.StateCount)
-        for j in range(1, BaseMoveWeights.StateCount + 1):
-            move.states[BaseMoveWeights.get_index_at_offset(t, j)] = (base_move.states[BaseMoveWeights.get_index_at_offset(t, j)] * t1_weight) + (base_move.states[BaseMoveWeights.get_index_at_offset(t, j - 1)] * t2_weight)
+        move = Move(base_weights.StateCount)
+        for j in range(1, base_weights.StateCount + 1):
+            move.states[base_weights.get_index_at_offset(t, j)] = (base_move.states[base_weights.get_index_at_offset(t, j)] * t1_weight) + (base_move.states[base_weights.get_index_at_offset(t, j - 1)] * t2_weight)
         return move
 
     def get_target_state_and_weights(self, degrees):
         if degrees == BaseMoveWeights.CircularRange:
             degrees = 0
-        p = BaseMoveWeights.StateCount * (degrees / BaseMoveWeights.CircularRange)
+        p = self.base_weights.StateCount * (degrees / BaseMoveWeights.CircularRange)
         t = int(math.floor(p))
         t2_weight = p - t          # fractional part
         t1_weight = 1 - t2_weight
         return t, t1_weight, t2_weight
 
-
-    @staticmethod
-    def test_score_move_series(degrees):
-        pos_sum = 0
-        neg_sum = 0
-        engine = MovePredictionEngine(len(degrees))
-
-        for degree in degrees:
-            exp = engine.record_move_and_get_predicted(degree)
-            score, add, neg = engine.get_scoring_weight(degree, exp)
-            pos_sum += add
-            neg_sum += neg
-
-        if pos_sum < neg_sum:
-            final_score = pos_sum / neg_sum
-        else:
-            final_score = 2 - (neg_sum / pos_sum)
-        return final_score * 100  # Range is 0 to 200. Scores are symmetrical around 100 (where pos_sum = neg_sum).
-
-    # Test function that simulates a 'game' of moveCount random moves, and returns the final score.
-    # The score average converges to 100 over multiple 'games'. 
-    @staticmethod
-    def test_score_random_moves(move_count=300):
-        rnd = random.Random()
-        degrees = [rnd.random() * BaseMoveWeights.CircularRange for _ in range(move_count)]
-        return MovePredictionEngine.test_score_move_series(degrees)
-
 '''
 Future expansion:
     3D support -- Simple: use 3 concurrent MPE's, one for each axis. Full: a spherical version of MPE. 
@@ -228,6 +451,33 @@ Future expansion:
     Similarity of two sequences -- based on similarty of weight values for each index.
 '''
 
+# Demo 'games' of 30 moves each, with their scores. Used by the demos below, and by Benchmark.py.
+DemoMoveSeries = [
+    # A rough circle (moves ~30 degrees apart, clockwise)
+    # Scores 3.0
+    [0, 30, 62, 89, 120, 147, 181, 210, 233, 270, 300, 330, 359, 29, 63, 95, 120, 151, 182, 211, 241, 270, 300, 325, 0, 29, 58, 90, 118, 146],
+
+    # A spiral (add 3 degrees each move, clockwise)
+    # Scores 62.96
+    [0, 3, 9, 18, 30, 45, 63, 84, 108, 135, 165, 198, 234, 273, 315, 0, 48, 99, 154, 214, 287, 353, 62, 134, 209, 287, 8, 92, 179, 269],
+
+    # Roughly back-forth, then roughly straight (repeated 3x)
+    # Scores 39.65
+    [270, 100, 280, 95, 285, 97, 90, 93, 95, 91, 90, 270, 93, 280, 101, 283, 280, 277, 280, 285, 105, 280, 102, 277, 98, 95, 90, 100, 97, 90],
+
+    # Above, but change to a rough boxes for final 10 moves
+    # Scores 71.96
+    [270, 100, 280, 95, 285, 97, 90, 93, 95, 91, 90, 270, 93, 280, 101, 283, 280, 277, 280, 10, 100, 185, 280, 15, 100, 185, 275, 0, 90, 180],
+
+    # High variation in angle changes
+    # Scores 127.48
+    [290, 330, 180, 240, 80, 90, 135, 135, 85, 230, 0, 125, 270, 100, 235, 40, 30, 75, 105, 0, 110, 210, 315, 345, 125, 150, 155, 280, 30, 50],
+
+    # Higher variation in angle changes
+    # Scores 138.29
+    [90, 110, 30, 200, 155, 135, 330, 175, 325, 330, 315, 350, 25, 220, 60, 300, 300, 50, 45, 15, 200, 100, 320, 120, 330, 150, 50, 300, 220, 120],
+]
+
 if __name__ == "__main__":
     
     # For visually displaying a move sequence in Python
@@ -278,42 +528,9 @@ if __name__ == "__main__":
         image.show()
 
     # Demos with 30-move 'games'
-
-    # A rough circle (moves ~30 degrees apart, clockwise)
-    # Scores 3.0
-    moves = [0, 30, 62, 89, 120, 147, 181, 210, 233, 270, 300, 330, 359, 29, 63, 95, 120, 151, 182, 211, 241, 270, 300, 325, 0, 29, 58, 90, 118, 146]
-    score = MovePredictionEngine.test_score_move_series(moves)
-    draw_moves(moves, score)
-
-    # A spiral (add 3 degrees each move, clockwise)
-    # Scores 62.96
-    moves = [0, 3, 9, 18, 30, 45, 63, 84, 108, 135, 165, 198, 234, 273, 315, 0, 48, 99, 154, 214, 287, 353, 62, 134, 209, 287, 8, 92, 179, 269]
-    score = MovePredictionEngine.test_score_move_series(moves)
-    draw_moves(moves, score)
-
-    # Roughly back-forth, then roughly straight (repeated 3x)
-    # Scores 39.65
-    moves = [270, 100, 280, 95, 285, 97, 90, 93, 95, 91, 90, 270, 93, 280, 101, 283, 280, 277, 280, 285, 105, 280, 102, 277, 98, 95, 90, 100, 97, 90]
-    score = MovePredictionEngine.test_score_move_series(moves)
-    draw_moves(moves, score)
-
-    # Above, but change to a rough boxes for final 10 moves
-    # Scores 71.96
-    moves = [270, 100, 280, 95, 285, 97, 90, 93, 95, 91, 90, 270, 93, 280, 101, 283, 280, 277, 280, 10, 100, 185, 280, 15, 100, 185, 275, 0, 90, 180]
-    score = MovePredictionEngine.test_score_move_series(moves)
-    draw_moves(moves, score)
-
-    # High variation in angle changes
-    # Scores 127.48
-    moves = [290, 330, 180, 240, 80, 90, 135, 135, 85, 230, 0, 125, 270, 100, 235, 40, 30, 75, 105, 0, 110, 210, 315, 345, 125, 150, 155, 280, 30, 50]
-    score = MovePredictionEngine.test_score_move_series(moves)
-    draw_moves(moves, score)
-
-    # Higher variation in angle changes
-    # Scores 138.29
-    moves = [90, 110, 30, 200, 155, 135, 330, 175, 325, 330, 315, 350, 25, 220, 60, 300, 300, 50, 45, 15, 200, 100, 320, 120, 330, 150, 50, 300, 220, 120]
-    score = MovePredictionEngine.test_score_move_series(moves)
-    draw_moves(moves, score)
+    for moves in DemoMoveSeries:
+        score = MovePredictionEngine.test_score_move_series(moves)
+        draw_moves(moves, score)
 
     '''
     # Average scores of 300 randomized games of 30 moves each
@@ -0,0 +1,196 @@
+import numpy as np
+
+from MovePredictionEngine import BaseMoveWeights, get_final_score
+from MovePredictionEngineNumpy import get_base_move_weights, get_target_states_and_weights
+
+"""
+Batched version of MovePredictionEngineNumpy, running many independent 'games' in one set of arrays:
+
+- self.weights is (game_count, history_depth, StateCount, StateCount), self.history is (game_count, history_depth, StateCount).
+- Each game has its own history count, and its own history depth (which sets its score scalers, and when its oldest Move is dropped).
+- Each step records one move for a selection of games, and scores them, with NumPy operations across all the selected games.
+
+score_move_series() is the batched equivalent of MovePredictionEngine.test_score_move_series(), for an (N_games, n_moves) array of degrees.
+Games of unequal length are padded with NaN (see pad_move_series()), or given explicit lengths.
+"""
+
+# Limits the weights of each block of a batched step to roughly this many floats (i.e. 256KB). Each block's prediction is followed by its update,
+# while the block is still in cache, and the update's temporary array is the same small size.
+StepBlockSize = 32 * 1024
+
+class MovePredictionEngineBatch:
+    def __init__(self, game_count, history_depth_count, history_depths=None, base_weights=None):
+        self.base_weights = base_weights if base_weights is not None else BaseMoveWeights.get()
+        self.game_count = game_count
+        self.history_depth = history_depth_count
+        self.state_count = self.base_weights.StateCount
+        self.base_move_weights = get_base_move_weights(self.base_weights)
+        self.sum_move_weights = self.base_weights.SumMoveWeights
+
+        # Per-game history depth, up to history_depth_count. E.g. the move count of each game, as in test_score_move_series().
+        if history_depths is None:
+            history_depths = np.full(game_count, history_depth_count)
+        self.history_depths = np.asarray(history_depths, dtype=np.int64)
+        if self.history_depths.shape != (game_count,) or self.history_depths.min() < 2 or self.history_depths.max() > history_depth_count:
+            raise ValueError("history_depths must have one depth per game, each from 2 to history_depth_count")
+
+        self.history = np.zeros((game_count, self.history_depth, self.state_count))
+        self.history_counts = np.zeros(game_count, dtype=np.int64)
+        self.weights = np.zeros((game_count, self.history_depth, self.state_count, self.state_count))
+
+        # Same as MovePredictionEngine.scoreScaler and ScoreScalerMiddle, for each game.
+        self.scoreScalers = 1.0 / np.log(self.history_depths)
+        self.ScoreScalerMiddles = np.power(self.history_depths / 2.0, self.scoreScalers)
+
+    # Starts new games in the selected slots: clears their weights and history, and (if given) sets their history depths and score scalers.
+    # E.g. to reuse the slots of finished games for new ones.
+    def reset_games(self, games, history_depths=None):
+        self.weights[games] = 0
+        self.history[games] = 0
+        self.history_counts[games] = 0
+        if history_depths is not None:
+            history_depths = np.asarray(history_depths, dtype=np.int64)
+            if history_depths.size and (history_depths.min() < 2 or history_depths.max() > self.history_depth):
+                raise ValueError("history_depths must each be from 2 to history_depth_count")
+            self.history_depths[games] = history_depths
+            self.scoreScalers[games] = 1.0 / np.log(self.history_depths[games])
+            self.ScoreScalerMiddles[games] = np.power(self.history_depths[games] / 2.0, self.scoreScalers[games])
+
+    # Records one move for each of the selected games, and gets their predicted Moves (as a (len(games), StateCount) array).
+    # games can be a slice or an index array. The weights are always updated in place: an index array is split into runs of consecutive games,
+    # each recorded as a slice, rather than gathering and scattering the weights. So selected games close together (e.g. the lowest slots) take fewer steps.
+    def record_moves_and_get_predicted(self, degrees, games=slice(None)):
+        moves = self.get_moves(degrees)
+        if isinstance(games, slice):
+            return self.record_slice_moves(moves, games)
+
+        games = np.asarray(games, dtype=np.int64)
+        order = np.argsort(games, kind='stable')
+        pred = np.zeros((len(games), self.state_count))
+        for run in np.split(order, np.flatnonzero(np.diff(games[order]) != 1) + 1):
+            if len(run):
+                first = int(games[run[0]])
+                pred[run] = self.record_slice_moves(moves[run], slice(first, first + len(run)))
+        return pred
+
+    # Records moves (as states) for a slice of games, in place. Only the depths up to the slice's largest history count are processed.
+    def record_slice_moves(self, moves, games):
+        weights = self.weights[games]
+        history = self.history[games]
+        counts = self.history_counts[games]
+        depths = self.history_depths[games]
+        n = int(counts.max()) if len(counts) else 0
+
+        # Forward, and reverse, history for each game. When all counts are equal (e.g. games played in step) these are just views.
+        if int(counts.min()) == n:
+            hist = history[:, :n]
+            hist_reverse = history[:, n - 1::-1] if n > 0 else hist
+        else:
+            d = np.arange(n)
+            valid = (d[None, :] < counts[:, None])[..., None]
+            reverse_index = np.maximum(counts[:, None] - 1 - d[None, :], 0)
+            hist = history[:, :n] * valid
+            hist_reverse = np.take_along_axis(history, reverse_index[..., None], axis=1) * valid
+
+        # The core loop of MovePredictionEngine, for all depths and all games, a block of games (or of one game's depths) at a time.
+        # Note each block's prediction must use its weights before the update.
+        pred = np.zeros((len(counts), self.state_count))
+        update = hist + hist_reverse
+        game_block = max(1, StepBlockSize // max(1, n * self.state_count * self.state_count))
+        depth_block = max(1, StepBlockSize // (self.state_count * self.state_count))
+        for g in range(0, len(counts), game_block):
+            for d in range(0, n, depth_block):
+                end = min(d + depth_block, n)
+                block = weights[g:g + game_block, d:end]
+                pred[g:g + game_block] += np.matmul(block, hist[g:g + game_block, d:end, :, None]).sum(axis=1)[..., 0]
+                block += moves[g:g + game_block, None, :, None] * update[g:g + game_block, d:end, None, :]
+
+        # Insert at the front of each history, dropping the oldest Move of games whose history is full.
+        # Only the Moves in use are shifted, as the rest are past every selected game's history count.
+        shift = min(n, self.history_depth - 1)
+        history[:, 1:shift + 1] = history[:, :shift]
+        history[:, 0] = moves
+        self.history_counts[games] = np.minimum(counts + 1, depths)
+        return pred
+
+    # Scores, pos_adds and neg_adds for the selected games, as arrays. The same as MovePredictionEngine.get_scoring_weight(), for each game.
+    def get_scoring_weights(self, degrees, predicted, games=slice(None)):
+        t, t1_weights, t2_weights = self.get_target_states_and_weights(degrees)
+        rows = np.arange(len(t))
+
+        sum_states = np.abs(predicted).sum(axis=1)
+        has_weight = sum_states > 0
+        sum_states = np.where(has_weight, sum_states, 1.0)
+
+        score = (((predicted[rows, t] * t1_weights) + (predicted[rows, (t + 1) % self.state_count] * t2_weights)) / sum_states) * self.sum_move_weights
+        max_abs = np.maximum(predicted.max(axis=1), -predicted.min(axis=1))
+        score_range_normalizer = (max_abs / sum_states) * self.sum_move_weights
+        neg_add = score_range_normalizer + score
+        pos_add = score_range_normalizer - score
+
+        scaler = np.power(self.history_counts[games], self.scoreScalers[games])
+        neg_add = np.where(has_weight, neg_add * scaler, 0.0)
+        pos_add = np.where(has_weight, pos_add * scaler, 0.0)
+        score = np.where(has_weight, score * scaler / self.ScoreScalerMiddles[games], 0.0)
+
+        return -score, pos_add, neg_add
+
+    def get_moves(self, degrees):
+        t, t1_weights, t2_weights = self.get_target_states_and_weights(degrees)
+        base = self.base_move_weights
+        return (base[t] * t1_weights[:, None]) + (base[(t + 1) % self.state_count] * t2_weights[:, None])
+
+    def get_target_states_and_weights(self, degrees):
+        return get_target_states_and_weights(degrees, self.state_count)
+
+# Final scores, from 0 to 200, for arrays of pos and neg sums. Each is MovePredictionEngine.get_final_score() of the game's sums.
+def get_final_scores(pos_sums, neg_sums):
+    return np.vectorize(get_final_score, otypes=[np.float64])(pos_sums, neg_sums)
+
+# Pads a list of move sequences to an (N_games, max_moves) array, with NaN after the end of each game. Also returns the lengths.
+def pad_move_series(move_series):
+    lengths = np.array([len(moves) for moves in move_series], dtype=np.int64)
+    degrees = np.full((len(move_series), lengths.max() if len(lengths) else 0), np.nan)
+    for g, moves in enumerate(move_series):
+        degrees[g, :len(moves)] = moves
+    return degrees, lengths
+
+# Batched MovePredictionEngine.test_score_move_series(). Returns per-game final scores, pos sums and neg sums.
+#
+# degrees is an (N_games, n_moves) array. If lengths isn't given, each game ends at its first NaN.
+# Games are run chunk_size at a time, longest first, so each chunk's arrays only need to be as deep as its longest game,
+# and the games still playing are always a leading slice of the chunk.
+def score_move_series(degrees, lengths=None, chunk_size=32, base_weights=None):
+    degrees = np.asarray(degrees, dtype=np.float64)
+    if degrees.ndim != 2:
+        raise ValueError("degrees must be an (N_games, n_moves) array")
+    if lengths is None:
+        padding = np.isnan(degrees)
+        lengths = np.where(padding.any(axis=1), padding.argmax(axis=1), degrees.shape[1])
+    lengths = np.asarray(lengths, dtype=np.int64)
+
+    game_count = len(lengths)
+    pos_sums = np.zeros(game_count)
+    neg_sums = np.zeros(game_count)
+    order = np.argsort(-lengths, kind='stable')
+
+    for c in range(0, game_count, chunk_size):
+        games = order[c:c + chunk_size]
+        chunk_lengths = lengths[games]
+        chunk_degrees = degrees[games]
+        engine = MovePredictionEngineBatch(len(games), int(chunk_lengths[0]), chunk_lengths, base_weights)
+
+        chunk_pos = np.zeros(len(games))
+        chunk_neg = np.zeros(len(games))
+        for k in range(int(chunk_lengths[0])):
+            playing = slice(0, int(np.count_nonzero(chunk_lengths > k)))
+            moves = chunk_degrees[playing, k]
+            pred = engine.record_moves_and_get_predicted(moves, playing)
+            score, add, neg = engine.get_scoring_weights(moves, pred, playing)
+            chunk_pos[playing] += add
+            chunk_neg[playing] += neg
+
+        pos_sums[games] = chunk_pos
+        neg_sums[games] = chunk_neg
+
+    return get_final_scores(pos_sums, neg_sums), pos_sums, neg_sums
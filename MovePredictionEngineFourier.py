@@ -0,0 +1,98 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from MovePredictionEngine import BaseMoveWeights
+from MovePredictionEngineIndexed import MovePredictionEngineIndexed
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy, get_base_move_weights
+
+"""
+Fourier-domain version of MovePredictionEngineNumpy.
+
+The rows of the base weights table are circular shifts of one triangle-wave profile, so the table is circulant,
+and every Move (a blend of two rows) is made only of the harmonics present in that profile.
+The triangle wave is antisymmetric over half a circle, so its even harmonics are all 0: with 30 states, Moves only have harmonics 1, 3, 5... 15.
+
+This engine keeps Moves, history and per-depth weights as coefficients over a real Fourier basis of those harmonics (a cos and sin vector for each).
+That's StateCount / 2 coefficients per Move, so the weights are 1/4 the size, and each move is ~1/4 the work, with exactly the same scores.
+The predicted Move is reconstructed to states with one (StateCount x coefficients) product, as get_scoring_weight() needs all of its states.
+
+The basis can also be truncated to the lowest harmonic_count harmonics. Harmonic k of the profile has magnitude ~1/k^2,
+so a few harmonics give close (but no longer identical) scores, at a cost independent of StateCount.
+"""
+
+# A (StateCount, n) array, with orthonormal cos and sin columns for each harmonic of the base weights profile (lowest first).
+def get_harmonic_basis(base_weights, harmonic_count=None):
+    state_count = base_weights.StateCount
+    base_move_weights = get_base_move_weights(base_weights)
+    spectrum = np.fft.rfft(base_move_weights[0]).real
+    harmonics = [k for k in range(1, len(spectrum)) if abs(spectrum[k]) > 1e-9 * abs(spectrum).max()]
+    if harmonic_count is not None:
+        harmonics = harmonics[:harmonic_count]
+
+    angles = (2 * math.pi / state_count) * np.arange(state_count)
+    columns = []
+    for k in harmonics:
+        if 2 * k == state_count:
+            # The highest harmonic for an even StateCount alternates 1, -1, and has no sin component.
+            columns.append(np.cos(k * angles) / math.sqrt(state_count))
+        else:
+            columns.append(np.cos(k * angles) * math.sqrt(2.0 / state_count))
+            columns.append(np.sin(k * angles) * math.sqrt(2.0 / state_count))
+    return np.array(columns).T
+
+class MovePredictionEngineFourier(MovePredictionEngineNumpy):
+    def __init__(self, history_depth_count, base_weights=None, harmonic_count=None, windowed=False, decay=None):
+        base_weights = base_weights if base_weights is not None else BaseMoveWeights.get()
+        self.harmonic_count = harmonic_count
+        super().__init__(history_depth_count, base_weights, get_harmonic_basis(base_weights, harmonic_count), windowed, decay)
+
+    # The basis is rebuilt from the harmonic count, rather than saved.
+    def get_snapshot_config(self):
+        return {"harmonic_count": self.harmonic_count, "windowed": self.windowed, "decay": self.decay}
+
+# Memory (bytes of all the engine's arrays) and speed (ms per move), of the dense, index-space and Fourier engines, for the same seeded games.
+# Also the largest final score difference from the dense engine, over the games.
+def compare_engines(state_counts=(30, 60, 120, 240), move_count=300, game_count=3, seed=0):
+    rnd = random.Random(seed)
+    games = [[rnd.random() * BaseMoveWeights.CircularRange for _ in range(move_count)] for _ in range(game_count)]
+
+    engine_types = [
+        ("dense", MovePredictionEngineNumpy),
+        ("indexed", MovePredictionEngineIndexed),
+        ("fourier", MovePredictionEngineFourier),
+        ("fourier-3", lambda depth, base_weights: MovePredictionEngineFourier(depth, base_weights, harmonic_count=3)),
+    ]
+
+    results = []
+    for state_count in state_counts:
+        base_weights = BaseMoveWeights.get(state_count)
+        dense_scores = None
+        for name, engine_type in engine_types:
+            scores = []
+            start = time.perf_counter()
+            for degrees in games:
+                engine = engine_type(len(degrees), base_weights)
+                for degree in degrees:
+                    engine.score_move(degree)
+                scores.append(engine.get_final_score())
+            elapsed = time.perf_counter() - start
+
+            if dense_scores is None:
+                dense_scores = scores
+            memory = sum(a.nbytes for a in vars(engine).values() if isinstance(a, np.ndarray))
+            results.append({
+                "state_count": state_count,
+                "engine": name,
+                "memory_bytes": memory,
+                "ms_per_move": 1000 * elapsed / (move_count * game_count),
+                "max_score_difference": max(abs(a - b) for a, b in zip(scores, dense_scores)),
+            })
+    return results
+
+if __name__ == "__main__":
+    print(f"{'States':>6} {'Engine':>10} {'Memory (MB)':>12} {'ms/move':>8} {'Max diff':>10}")
+    for r in compare_engines():
+        print(f"{r['state_count']:>6} {r['engine']:>10} {r['memory_bytes'] / 1e6:>12.2f} {r['ms_per_move']:>8.3f} {r['max_score_difference']:>10.2e}")
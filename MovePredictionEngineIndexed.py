@@ -0,0 +1,109 @@
+import numpy as np
+
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy
+
+"""
+Index-space version of MovePredictionEngineNumpy, for higher StateCounts.
+
+Every Move is a blend of two rows of the base weights table B: move = (t1_weight * B[t]) + (t2_weight * B[t + 1]).
+So each depth's weights can be written as W[d] = B.T @ C[d] @ B, where C[d] is a coefficient matrix over base row indices,
+and each rank-1 update of C[d] touches only 2 x 4 cells (the new Move's 2 rows, and the 2 + 2 rows of the paired history Moves).
+
+This engine stores P[d] = C[d] @ G instead of C[d], where G = B @ B.T is the (fixed) Gram matrix of the base rows. Then:
+- An update adds to 2 rows of P[d]: the new Move's rows, times the history Moves projected by G (B @ move, stored with the history).
+- The prediction for depth d, W[d] @ history[d] = B.T @ P[d] @ coefficients[d], reads just 2 columns of P[d].
+- The prediction is expanded to state space only once, after summing over all depths.
+
+So a move costs O(depth * StateCount) rather than O(depth * StateCount^2). Scores are the same as the reference engine, within floating point tolerance.
+"""
+
+class MovePredictionEngineIndexed(MovePredictionEngineNumpy):
+    def __init__(self, history_depth_count, base_weights=None, windowed=False, decay=None):
+        # self.weights, as set up by the base class, holds P[d] = C[d] @ G (see above). Its rows are base row indices.
+        super().__init__(history_depth_count, base_weights, windowed=windowed, decay=decay)
+        self.gram = self.base_move_weights @ self.base_move_weights.T
+
+        # The history is kept as base row coefficients (states t and t + 1, with their weights), and the Moves projected by G.
+        # These are circular buffers, the same as the base class's history_buffer, which here holds the projected Moves.
+        self.history_states = np.zeros(2 * self.history_depth, dtype=np.int64)
+        self.history_coefficients = np.zeros((2 * self.history_depth, 2))
+
+    # The history's base row coefficients are saved with the projected Moves and P[d].
+    snapshot_arrays = MovePredictionEngineNumpy.snapshot_arrays + ("history_states", "history_coefficients")
+
+    # A Move's coefficients over the base rows: rows t and t + 1, with their weights. All the other coefficients are 0.
+    def get_move_coefficients(self, degrees):
+        return self.get_target_state_and_weights(degrees)
+
+    # The base row coefficients of the prediction, for each depth: 2 columns of each P[d], weighted by the coefficients of history[d].
+    def get_prediction_by_depth(self):
+        n = self.history_count
+        depths = np.arange(n)
+        states = self.history_states[self.history_start:self.history_start + n]
+        coefficients = self.history_coefficients[self.history_start:self.history_start + n]
+        weights = self.weights[:n]
+        by_depth = (weights[depths, :, states] * coefficients[:, :1]) + (weights[depths, :, (states + 1) % self.state_count] * coefficients[:, 1:])
+        for move, update in self.weight_updates:
+            update_by_depth = self.get_update_prediction_by_depth(move, update)
+            by_depth[:len(update_by_depth)] += update_by_depth
+        if self.decay is not None:
+            by_depth *= self.weight_scale
+        return by_depth
+
+    def get_prediction(self):
+        return self.get_prediction_by_depth().sum(axis=0)
+
+    # Expands base row coefficients to states, by B.T (B is symmetric, so this is the same for a vector, or an array of row vectors).
+    def get_states(self, coefficients):
+        return coefficients @ self.base_move_weights
+
+    # Adds to the new Move's 2 rows of each P[d], with the update from the forward and reverse history Moves (projected by G).
+    def add_weight_update(self, move, update):
+        t, t1_weight, t2_weight = move
+        weights = self.weights[:len(update)]
+        weights[:, t, :] += t1_weight * update
+        weights[:, (t + 1) % self.state_count, :] += t2_weight * update
+
+    # The base row coefficients of the prediction from an update not yet added: the update's 2 columns (as in get_prediction_by_depth()),
+    # added to the new Move's 2 rows.
+    def get_update_prediction_by_depth(self, move, update):
+        t, t1_weight, t2_weight = move
+        n = min(len(update), self.history_count)
+        depths = np.arange(n)
+        states = self.history_states[self.history_start:self.history_start + n]
+        coefficients = self.history_coefficients[self.history_start:self.history_start + n]
+        terms = (update[depths, states] * coefficients[:, 0]) + (update[depths, (states + 1) % self.state_count] * coefficients[:, 1])
+
+        by_depth = np.zeros((n, self.state_count))
+        by_depth[:, t] += t1_weight * terms
+        by_depth[:, (t + 1) % self.state_count] += t2_weight * terms
+        return by_depth
+
+    # The terms to remove are (Move k x e) for the later Moves k, which in P[d] are the 2 rows of each Move k, less the oldest Move e projected by G.
+    def remove_oldest_terms(self, move):
+        forward, reverse = self.get_oldest_term_depths()
+        t, t1_weight, t2_weight = move
+        n = self.history_count
+        states = np.append(self.history_states[self.history_start:self.history_start + n - 1][::-1], t)
+        coefficients = np.concatenate((self.history_coefficients[self.history_start:self.history_start + n - 1][::-1], [(t1_weight, t2_weight)]))
+
+        depths = np.concatenate((forward, reverse))[:, None]
+        rows = np.tile(np.stack((states, (states + 1) % self.state_count), axis=1), (2, 1))
+        oldest = self.history_buffer[self.history_start + n - 1]
+
+        self.own_weights()
+        np.subtract.at(self.weights, (depths, rows), np.tile(coefficients, (2, 1))[..., None] * oldest)
+
+    def insert_history(self, move):
+        t, t1_weight, t2_weight = move
+        projected = (self.gram[t] * t1_weight) + (self.gram[(t + 1) % self.state_count] * t2_weight)
+        start = self.advance_history()
+        for slot in (start, start + self.history_depth):
+            self.history_states[slot] = t
+            self.history_coefficients[slot] = (t1_weight, t2_weight)
+            self.history_buffer[slot] = projected
+
+    # Each recorded move is already only O(depth * StateCount), so there's little to gain from summing the updates first.
+    def record_moves(self, degrees):
+        for degree in degrees:
+            self.record_move(degree)
@@ -0,0 +1,607 @@
+import collections
+import copy
+import json
+import math
+import os
+import struct
+import weakref
+
+import numpy as np
+
+from MovePredictionEngine import BaseMoveWeights, Move, MoveScoring
+
+"""
+NumPy backend for MovePredictionEngine. The scoring logic and results are the same as the reference engine (within floating point tolerance),
+only the data layout and the core loop differ:
+
+- self.weights is a single (history_depth, StateCount, StateCount) array, instead of history_depth lists of StateCount Moves.
+- The history is a preallocated circular buffer of history_depth Moves. self.history is a (history_count, StateCount) view of it, most recent Move first.
+- The core loop over history depth x StateCount x StateCount is one stacked matmul for the prediction, and one broadcast add for the rank-1 weight updates.
+
+Moves returned by this engine are regular Move objects, whose states are ndarrays. So they can be passed to either engine's get_scoring_weight().
+"""
+
+# Snapshot layout (see save()): magic, version and header length, a JSON header, then each array's raw bytes, aligned to SnapshotAlignment.
+SnapshotMagic = b"MPESNAP\0"
+SnapshotVersion = 1
+SnapshotAlignment = 64
+SnapshotPrefixSize = len(SnapshotMagic) + 8
+
+# Limits the temporary arrays of bulk updates to roughly this many floats (i.e. 16MB).
+UpdateBlockSize = 2 * 1024 * 1024
+
+# With decay, the weights are renormalized once their scale falls below this. Far from underflow, and with decay 0.99, once every ~23000 moves.
+RenormalizeWeightScale = 1e-100
+
+# Wraps a states array in a Move, without copying it.
+def as_move(states):
+    move = Move.__new__(Move)
+    move.states = states
+    return move
+
+# The tables of get_base_move_weights(), by BaseMoveWeights. A table can also be added from elsewhere, e.g. shared memory (see SharedEngineMemory).
+BaseMoveWeightsTables = {}
+
+# The MoveWeights of a BaseMoveWeights, as a read-only (StateCount, StateCount) array. Cached, as BaseMoveWeights are shared and immutable.
+def get_base_move_weights(base_weights):
+    table = BaseMoveWeightsTables.get(base_weights)
+    if table is None:
+        table = np.array([m.states for m in base_weights.MoveWeights])
+        table.flags.writeable = False
+        table = BaseMoveWeightsTables.setdefault(base_weights, table)
+    return table
+
+# Checks the magic and version of a snapshot, from its first SnapshotPrefixSize bytes, and returns the length of its header (which follows).
+def get_snapshot_header_length(prefix):
+    if prefix[:len(SnapshotMagic)] != SnapshotMagic:
+        raise ValueError("Not a MovePredictionEngine snapshot")
+    version, header_length = struct.unpack("<II", prefix[len(SnapshotMagic):SnapshotPrefixSize])
+    if version != SnapshotVersion:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    return header_length
+
+# The target states, and their t1 and t2 weights, for an array of degrees. The same as MovePredictionEngine.get_target_state_and_weights(), for each.
+def get_target_states_and_weights(degrees, state_count):
+    degrees = np.asarray(degrees, dtype=np.float64)
+    degrees = np.where(degrees == BaseMoveWeights.CircularRange, 0.0, degrees)
+    p = state_count * (degrees / BaseMoveWeights.CircularRange)
+    t = np.floor(p)
+    t2_weights = p - t
+    t1_weights = 1 - t2_weights
+    return t.astype(np.int64), t1_weights, t2_weights
+
+# Engine for prediciting circular moves, and scoring actual moves based on the predicted. Same interface as MovePredictionEngine.
+class MovePredictionEngineNumpy(MoveScoring):
+    # basis, if given, is a (StateCount, n) array with orthonormal columns, spanning all Moves (see MovePredictionEngineFourier).
+    # The weights and history are then kept as n-sized coefficient vectors over the basis, and predictions are expanded back to states.
+    # windowed, if set, removes the weight updates involving each Move as it's dropped from the history (see remove_oldest_terms()).
+    # decay, if given, is a factor (e.g. 0.99) the weights are multiplied by each move, before its update is added (see update_weights()).
+    def __init__(self, history_depth_count, base_weights=None, basis=None, windowed=False, decay=None):
+        self.base_weights = base_weights if base_weights is not None else BaseMoveWeights.get()
+        self.history_depth = history_depth_count
+        self.state_count = self.base_weights.StateCount
+        self.base_move_weights = get_base_move_weights(self.base_weights)
+        self.sum_move_weights = self.base_weights.SumMoveWeights
+
+        self.basis = basis
+        self.move_coefficients = self.base_move_weights if basis is None else self.base_move_weights @ basis
+        vector_size = self.move_coefficients.shape[1]
+
+        # The history is a circular buffer, starting (with the most recent Move) at history_start, and going back history_count Moves.
+        # Each Move is written twice, at slot and slot + history_depth, so the history is always one contiguous view, with no wrap around.
+        # Inserting a Move just moves the start back one slot (over the oldest Move, once full), so nothing is shifted or reallocated.
+        self.history_buffer = np.zeros((2 * self.history_depth, vector_size))
+        self.history_start = 0
+        self.history_count = 0
+        # The history count when each history Move was recorded (i.e. how many Moves its weight update paired it with), in the same slots.
+        self.history_counts = np.zeros(2 * self.history_depth, dtype=np.int64)
+        self.windowed = windowed
+        self.weights = np.zeros((self.history_depth, vector_size, vector_size))
+
+        # With decay, the weights are self.weights * weight_scale. See update_weights().
+        if decay is not None and (windowed or not 0 < decay <= 1):
+            raise ValueError("decay must be from 0 to 1, and can't be used with windowed")
+        self.decay = decay
+        self.weight_scale = 1.0
+
+        # The engines sharing self.weights with this one (including it), if it's been forked, and the updates not yet added to self.weights.
+        # See fork().
+        self.weight_sharers = None
+        self.weight_updates = []
+
+        # Total moves recorded, and (if tracked) the contributions of each history Move to each move's prediction. See track_contributions().
+        self.move_count = 0
+        self.contributions = None
+
+        # See MovePredictionEngine for the reasoning behind these.
+        self.scoreScaler = (1.0 / math.log(self.history_depth))
+        self.ScoreScalerMiddle = math.pow(self.history_depth / 2.0, self.scoreScaler)
+
+        # The sums of the pos_adds and neg_adds of moves scored with score_move(), for get_final_score().
+        self.pos_sum = 0
+        self.neg_sum = 0
+
+    # Given the directional degrees of a 'move', records a Move, and gets the 'predicted' Move.
+    # This is the core loop of the reference engine, for all depths at once. Note the prediction must use the weights before this move's update.
+    def record_move_and_get_predicted(self, degrees):
+        self.check_recordable()
+        move = self.get_move_coefficients(degrees)
+        if self.contributions is None:
+            pred = self.get_prediction_and_update_weights(move)
+        else:
+            pred = self.record_contributions(degrees)
+            self.update_weights(move)
+        if self.windowed and self.history_count == self.history_depth:
+            self.remove_oldest_terms(move)
+        self.insert_history(move)
+        self.move_count += 1
+        return as_move(self.get_states(pred))
+
+    # Records a Move, without getting the predicted Move. E.g. for seeding an engine with a prior game's moves ('Continuity').
+    # When contributions are tracked, the prediction is still needed for them, so there's no saving.
+    def record_move(self, degrees):
+        self.check_recordable()
+        move = self.get_move_coefficients(degrees)
+        if self.contributions is not None:
+            self.record_contributions(degrees)
+        self.update_weights(move)
+        if self.windowed and self.history_count == self.history_depth:
+            self.remove_oldest_terms(move)
+        self.insert_history(move)
+        self.move_count += 1
+
+    # Records a series of moves, in one vectorized update. The result is the same as calling record_move() for each.
+    #
+    # Recording never reads the weights, so the updates of all the moves can be summed, and added at once.
+    # With the old history and the new moves in one chronological sequence, the new move at position p (with n history Moves before it)
+    # adds move[p] x (sequence[p - 1 - d] + sequence[p - n + d]) to the weights at depth d.
+    # Windowed engines remove terms as Moves are dropped, and decaying engines scale each move's update, so they record one move at a time.
+    def record_moves(self, degrees):
+        if self.contributions is not None or self.windowed or self.decay is not None:
+            for degree in degrees:
+                self.record_move(degree)
+            return
+
+        self.check_recordable()
+        self.own_weights()
+        moves = np.array([self.get_move_coefficients(degree) for degree in degrees]).reshape(-1, self.history_buffer.shape[1])
+        n = self.history_count
+        sequence = np.concatenate((self.history[::-1], moves))
+        positions = n + np.arange(len(moves))
+        counts = np.minimum(positions, self.history_depth)
+        sequence_counts = np.concatenate((self.history_counts[self.history_start:self.history_start + n][::-1], counts))
+
+        # Moves are added in blocks, to limit the size of the gathered history (block x depth x vector size).
+        block = max(1, UpdateBlockSize // (self.history_depth * sequence.shape[1]))
+        for k in range(0, len(moves), block):
+            block_positions = positions[k:k + block]
+            block_counts = counts[k:k + block]
+            depth_count = int(block_counts.max())
+            d = np.arange(depth_count)
+            valid = (d[None, :] < block_counts[:, None])[..., None]
+            forward = np.maximum(block_positions[:, None] - 1 - d[None, :], 0)
+            reverse = np.clip(block_positions[:, None] - block_counts[:, None] + d[None, :], 0, len(sequence) - 1)
+            update = (sequence[forward] + sequence[reverse]) * valid
+
+            # weights[d] += sum over moves k of moves[k] x update[k, d], as one matrix product.
+            vector_size = sequence.shape[1]
+            summed = moves[k:k + block].T @ update.reshape(len(block_positions), depth_count * vector_size)
+            self.weights[:depth_count] += summed.reshape(vector_size, depth_count, vector_size).transpose(1, 0, 2)
+
+        keep = min(len(sequence), self.history_depth)
+        self.history_buffer[:keep] = self.history_buffer[self.history_depth:self.history_depth + keep] = sequence[len(sequence) - keep:][::-1]
+        self.history_counts[:keep] = self.history_counts[self.history_depth:self.history_depth + keep] = sequence_counts[len(sequence) - keep:][::-1]
+        self.history_start = 0
+        self.history_count = keep
+        self.move_count += len(moves)
+
+    # Starts tracking contributions, for get_contributing_weights(). See MovePredictionEngine.track_contributions() for how they're tracked.
+    # Here the prediction is kept per depth (see get_prediction_by_depth()), so each depth's term is scored as the move is played.
+    def track_contributions(self):
+        self.contributions = collections.deque(maxlen=self.history_depth)
+
+    # Gets the prediction by depth, scores each depth's term against the actual move, and returns the summed prediction.
+    # Scores are kept without the move count scaler, which get_contributing_weights() applies.
+    def record_contributions(self, degrees):
+        by_depth = self.get_prediction_by_depth()
+        scores = self.get_raw_scores(degrees, self.get_states(by_depth))
+        # Reversed, so scores are in chronological order of the history Moves: scores[-1] is for the previous move.
+        self.contributions.append((self.move_count, scores[::-1]))
+        return by_depth.sum(axis=0)
+
+    # The same as MovePredictionEngine.get_contributing_weights(), with each target's scores added as one slice.
+    def get_contributing_weights(self, moves_of_interest=None):
+        first = self.move_count - self.history_count
+        targets = None if moves_of_interest is None else set(first + x for x in moves_of_interest)
+
+        weights = np.zeros(self.history_depth)
+        for target, scores in self.contributions or ():
+            if target < first or (targets is not None and target not in targets):
+                continue
+            start = max(target - len(scores), first)
+            weights[start - first:target - first] += scores[start - (target - len(scores)):]
+
+        # Scaled and negated the same as the score from get_scoring_weight().
+        return (weights * -(math.pow(self.history_count, self.scoreScaler) / self.ScoreScalerMiddle)).tolist()
+
+    # The predicted Move (as a vector over the basis), from the current weights and history.
+    def get_prediction(self):
+        pred = self.get_weights_prediction()
+        for move, update in self.weight_updates:
+            pred += self.get_update_prediction_by_depth(move, update).sum(axis=0)
+        if self.decay is not None:
+            pred *= self.weight_scale
+        return pred
+
+    # Gets the prediction, then adds the move's update to the weights. Subclasses can do both in one pass over the weights (see MovePredictionEngineThreaded).
+    def get_prediction_and_update_weights(self, move):
+        pred = self.get_prediction()
+        self.update_weights(move)
+        return pred
+
+    # The prediction from self.weights alone, i.e. without the updates kept aside by a fork, or the decay scale.
+    def get_weights_prediction(self):
+        return self.get_weights_prediction_by_depth().sum(axis=0)
+
+    # Each depth's term of the prediction from self.weights, weights[d] @ history[d], as one stacked matmul (faster than the equivalent einsum).
+    def get_weights_prediction_by_depth(self):
+        return np.matmul(self.weights[:self.history_count], self.history[:, :, None])[:, :, 0]
+
+    # The terms of get_prediction(), for each depth.
+    def get_prediction_by_depth(self):
+        by_depth = self.get_weights_prediction_by_depth()
+        for move, update in self.weight_updates:
+            update_by_depth = self.get_update_prediction_by_depth(move, update)
+            by_depth[:len(update_by_depth)] += update_by_depth
+        if self.decay is not None:
+            by_depth *= self.weight_scale
+        return by_depth
+
+    # Adds the rank-1 updates for a new Move, at each depth: weights[d] += move x update[d].
+    # The reverse pairing, history[(len - 1) - d], is simply the valid part of the history read backwards.
+    #
+    # With decay, the weights are decayed by only multiplying weight_scale, and the update is divided by the new scale, so it's added at full size.
+    # That's O(1) per move, rather than a pass over all the weights. The weights are multiplied out (renormalized) only once the scale gets small.
+    # A term from k moves ago then has decay^k of its weight. So with decay 0.99, moves more than ~460 moves ago have less than 1% of their weight,
+    # and a history depth around that size covers all but a negligible part of the prediction.
+    def update_weights(self, move):
+        update = self.get_weight_update()
+        if self.weight_sharers is not None and len(self.weight_sharers) > 1:
+            # The weights are shared with a live fork, so the update is kept aside, until there are enough to be worth a copy of the weights.
+            self.weight_updates.append((move, update))
+            if len(self.weight_updates) > self.history_buffer.shape[1]:
+                self.own_weights()
+        else:
+            self.own_weights()
+            self.add_weight_update(move, update)
+        self.renormalize_weights()
+
+    # The update of each depth for the next move (before it's inserted in the history). With decay, this also decays weight_scale.
+    def get_weight_update(self):
+        hist = self.history
+        update = hist + hist[::-1]
+        if self.decay is not None:
+            self.weight_scale *= self.decay
+            update /= self.weight_scale
+        return update
+
+    def renormalize_weights(self):
+        if self.weight_scale < RenormalizeWeightScale:
+            self.own_weights()
+            self.weights *= self.weight_scale
+            self.weight_scale = 1.0
+
+    def add_weight_update(self, move, update):
+        self.weights[:len(update)] += move[None, :, None] * update[:, None, :]
+
+    # The prediction terms, for each depth, of an update not yet added to the weights: (move x update[d]) @ history[d].
+    # Only the depths the update covers (when it was made) are returned.
+    def get_update_prediction_by_depth(self, move, update):
+        n = min(len(update), self.history_count)
+        return np.einsum('dj,dj->d', update[:n], self.history[:n])[:, None] * move[None, :]
+
+    # Windowed: removes the terms pairing the oldest history Move with later Moves from the weights, before it's dropped for the new move.
+    #
+    # The weights then only ever hold the terms between pairs of Moves still in the history (i.e. the sum of the rank-1 updates,
+    # less every term involving a dropped Move), so they stay bounded however many moves are recorded, and each move costs the same.
+    # The new move's own update has just been added, so it's one of the later Moves.
+    #
+    # The oldest Move e is paired with each later Move k (k - e = 1 to history_count) in k's update: forward at depth (k - e) - 1,
+    # and reversed at depth n_k - (k - e), where n_k is the history count k was recorded with. Those terms are all (Move k x e),
+    # so the later Moves are summed by depth, and removed from each depth's weights with one product.
+    def remove_oldest_terms(self, move):
+        forward, reverse = self.get_oldest_term_depths()
+        hist = self.history
+        later = np.concatenate((hist[-2::-1], move[None, :]))
+        summed = later.copy()
+        np.add.at(summed, reverse, later)
+
+        self.own_weights()
+        self.weights[:len(summed)] -= summed[:, :, None] * hist[-1][None, None, :]
+
+    # The forward and reverse depths of the terms pairing the oldest history Move with each later Move (see remove_oldest_terms()).
+    # Both are in order of the later Moves: oldest first, ending with the move being recorded.
+    def get_oldest_term_depths(self):
+        n = self.history_count
+        offsets = np.arange(1, n + 1)
+        counts = np.append(self.history_counts[self.history_start:self.history_start + n - 1][::-1], n)
+        return offsets - 1, counts - offsets
+
+    # Starts a new game, with a history depth of history_depth_count (by default, the same depth). E.g. to score a corpus with one engine, rather than one per game.
+    # Each array is reused when it's big enough (from an earlier, deeper game), so only its used part is zeroed. It's reallocated if it's too small,
+    # read-only, or (for the weights) still shared with a fork.
+    def reset(self, history_depth_count=None):
+        depth = history_depth_count or self.history_depth
+        shared = self.weight_sharers is not None and len(self.weight_sharers) > 1
+        if self.weight_sharers is not None:
+            self.weight_sharers.discard(self)
+            self.weight_sharers = None
+        self.weight_updates = []
+
+        for name in self.snapshot_arrays:
+            a = getattr(self, name)
+            storage = a if a.base is None else a.base
+            rows = (len(a) // self.history_depth) * depth
+            if (name != "weights" or not shared) and a.flags.writeable and isinstance(storage, np.ndarray) and storage.base is None \
+                    and len(storage) >= rows and storage.shape[1:] == a.shape[1:]:
+                a = storage[:rows]
+                a[...] = 0
+            else:
+                a = np.zeros((rows,) + a.shape[1:], a.dtype)
+            setattr(self, name, a)
+
+        self.history_depth = depth
+        self.history_start = 0
+        self.history_count = 0
+        self.weight_scale = 1.0
+        self.move_count = 0
+        if self.contributions is not None:
+            self.track_contributions()
+        self.scoreScaler = (1.0 / math.log(self.history_depth))
+        self.ScoreScalerMiddle = math.pow(self.history_depth / 2.0, self.scoreScaler)
+        self.pos_sum = 0
+        self.neg_sum = 0
+
+    # Returns a copy-on-write copy of the engine, e.g. to try out candidate moves, without changing this engine.
+    #
+    # The fork shares self.weights (by far the largest array) with this engine. The history is copied, as it's only O(history_depth * StateCount).
+    # While the weights are shared, each engine keeps its own updates aside (in weight_updates), and adds their terms to its predictions,
+    # which is O(history_depth * StateCount) per kept update. So a fork that records a few moves, and is then dropped, never copies the weights.
+    # An engine copies the weights only after it keeps more updates than the size of a Move vector (when the kept terms would cost more than the copy).
+    # Once the other engines sharing the weights are gone, the next update adds any kept updates to the weights in place.
+    def fork(self):
+        if self.weight_sharers is None:
+            self.weight_sharers = weakref.WeakSet((self,))
+        fork = copy.copy(self)
+        for name in self.snapshot_arrays:
+            if name != "weights":
+                setattr(fork, name, getattr(self, name).copy())
+        fork.weight_updates = list(self.weight_updates)
+        if self.contributions is not None:
+            fork.contributions = collections.deque(self.contributions, maxlen=self.history_depth)
+        self.weight_sharers.add(fork)
+        return fork
+
+    # Makes self.weights this engine's own (copying it, if it's still shared with a live fork, or read-only), and adds any updates kept aside.
+    # Read-only weights are those of an engine attached from shared memory (see SharedEngineMemory), which is only recorded on through its forks.
+    def own_weights(self):
+        if self.weight_sharers is not None:
+            self.weight_sharers.discard(self)
+            if len(self.weight_sharers) > 0 or not self.weights.flags.writeable:
+                self.weights = self.weights.copy()
+            self.weight_sharers = None
+        for move, update in self.weight_updates:
+            self.add_weight_update(move, update)
+        self.weight_updates = []
+
+    # Raises a ValueError before a move changes any state, if the weights are read-only and not shared with a fork (so the move has nowhere to go).
+    # E.g. an engine attached from shared memory, which is recorded on through its forks.
+    def check_recordable(self):
+        if self.weight_sharers is None and not self.weights.flags.writeable:
+            raise ValueError("the engine's weights are read-only; record moves on a fork() of it")
+
+    # Inserts a Move at the front of the history, dropping the oldest Move if the history is full.
+    def insert_history(self, move):
+        slot = self.advance_history()
+        self.history_buffer[slot] = self.history_buffer[slot + self.history_depth] = move
+
+    # Moves the start of the history back one slot, and returns it. The caller writes the new Move at slot, and slot + history_depth.
+    # Also keeps the history count the new Move is recorded with, in history_counts.
+    def advance_history(self):
+        self.history_start = (self.history_start - 1) % self.history_depth
+        self.history_counts[self.history_start] = self.history_counts[self.history_start + self.history_depth] = self.history_count
+        self.history_count = min(self.history_count + 1, self.history_depth)
+        return self.history_start
+
+    # The valid history, most recent Move first (as a view). The reverse pairing of the core loop, history[(len - 1) - d], is history[::-1].
+    @property
+    def history(self):
+        return self.history_buffer[self.history_start:self.history_start + self.history_count]
+
+    # The arrays saved by save(), by attribute name. Everything else is either in the header, or rebuilt from it.
+    snapshot_arrays = ("weights", "history_buffer", "history_counts")
+
+    # Constructor arguments (besides history depth and base weights) needed to rebuild this engine from a snapshot. Must be JSON serializable.
+    def get_snapshot_config(self):
+        config = {"windowed": self.windowed, "decay": self.decay}
+        if self.basis is not None:
+            config["basis"] = self.basis.tolist()
+        return config
+
+    @classmethod
+    def from_snapshot_config(cls, history_depth_count, base_weights, config):
+        if "basis" in config:
+            config = dict(config, basis=np.array(config["basis"]))
+        return cls(history_depth_count, base_weights, **config)
+
+    # Saves the engine to a file path, or a binary file object, so it can be restored by load() in one read.
+    #
+    # The layout is versioned: SnapshotMagic, then the version and header length (2 little-endian uint32's), then a JSON header
+    # (engine type and config, StateCount, history depth and position, move count and scaler constants, and each array's dtype, shape and offset).
+    # The arrays follow as raw bytes, each at an offset aligned to SnapshotAlignment, so they can be memory-mapped directly.
+    # Tracked contributions (see track_contributions()) aren't saved.
+    def save(self, path_or_buffer):
+        if self.weight_updates:
+            self.own_weights()
+        arrays = [(name, np.ascontiguousarray(getattr(self, name))) for name in self.snapshot_arrays]
+        header = {
+            "engine": type(self).__name__,
+            "config": self.get_snapshot_config(),
+            "state_count": self.state_count,
+            "history_depth": self.history_depth,
+            "history_start": self.history_start,
+            "history_count": self.history_count,
+            "move_count": self.move_count,
+            "scoreScaler": self.scoreScaler,
+            "ScoreScalerMiddle": self.ScoreScalerMiddle,
+            "weight_scale": self.weight_scale,
+            "pos_sum": self.pos_sum,
+            "neg_sum": self.neg_sum,
+            "arrays": [],
+        }
+
+        # The offsets depend on the header length, which depends on the offsets. So the header is padded to an aligned size, and offsets set after.
+        header_size = len(json.dumps(dict(header, arrays=[{"name": name, "dtype": a.dtype.str, "shape": a.shape, "offset": 2 ** 63} for name, a in arrays])))
+        offset = -(-(SnapshotPrefixSize + header_size) // SnapshotAlignment) * SnapshotAlignment
+        for name, a in arrays:
+            header["arrays"].append({"name": name, "dtype": a.dtype.str, "shape": a.shape, "offset": offset})
+            offset += -(-a.nbytes // SnapshotAlignment) * SnapshotAlignment
+        header_bytes = json.dumps(header).encode("utf-8")
+
+        owns_file = isinstance(path_or_buffer, (str, os.PathLike))
+        f = open(path_or_buffer, "wb") if owns_file else path_or_buffer
+        try:
+            position = f.write(SnapshotMagic + struct.pack("<II", SnapshotVersion, len(header_bytes)) + header_bytes)
+            for entry, (name, a) in zip(header["arrays"], arrays):
+                position += f.write(bytes(entry["offset"] - position))
+                position += f.write(memoryview(a).cast("B"))
+        finally:
+            if owns_file:
+                f.close()
+
+    # Restores an engine saved by save(), from a file path, or a binary file object positioned at the start of the snapshot.
+    # With mmap (file paths only), the arrays are memory-mapped copy-on-write: pages are read as they're used, and the file is never changed.
+    # The engine type is taken from the snapshot. It must be this class, or a subclass of it.
+    @classmethod
+    def load(cls, path_or_buffer, mmap=False):
+        owns_file = isinstance(path_or_buffer, (str, os.PathLike))
+        if mmap and not owns_file:
+            raise ValueError("mmap requires a file path")
+
+        f = open(path_or_buffer, "rb") if owns_file else path_or_buffer
+        try:
+            start = 0 if owns_file else f.tell()
+            header_length = get_snapshot_header_length(f.read(SnapshotPrefixSize))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+
+            arrays = {}
+            for entry in header["arrays"]:
+                shape = tuple(entry["shape"])
+                dtype = np.dtype(entry["dtype"])
+                if mmap:
+                    arrays[entry["name"]] = np.memmap(path_or_buffer, dtype, "c", entry["offset"], shape)
+                else:
+                    f.seek(start + entry["offset"])
+                    a = np.empty(shape, dtype)
+                    f.readinto(memoryview(a).cast("B"))
+                    arrays[entry["name"]] = a
+        finally:
+            if owns_file:
+                f.close()
+        return cls.from_snapshot(header, arrays)
+
+    # Creates an engine from a snapshot's header, and its arrays (by name), which the engine then uses as they are.
+    @classmethod
+    def from_snapshot(cls, header, arrays):
+        engine_types = {}
+        pending = [cls]
+        while pending:
+            engine_type = pending.pop()
+            engine_types[engine_type.__name__] = engine_type
+            pending.extend(engine_type.__subclasses__())
+        if header["engine"] not in engine_types:
+            raise ValueError(f"Snapshot is of a {header['engine']}, not a {cls.__name__}")
+
+        # The new engine's (zeroed, and so not yet paged in) arrays are replaced by the loaded ones.
+        engine = engine_types[header["engine"]].from_snapshot_config(header["history_depth"], BaseMoveWeights.get(header["state_count"]), header["config"])
+        for name, a in arrays.items():
+            setattr(engine, name, a)
+        for name in ("history_start", "history_count", "move_count", "scoreScaler", "ScoreScalerMiddle", "weight_scale", "pos_sum", "neg_sum"):
+            setattr(engine, name, header[name])
+        return engine
+
+    # Get a score, given the actual 'move' direction, and the predicted Move.
+    def get_scoring_weight(self, degrees, predicted):
+        t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
+        states = np.asarray(predicted.states)
+
+        neg_add = pos_add = 0
+        score = 0
+        sum_states = float(np.abs(states).sum())
+        if sum_states > 0:
+            score = (((states[t] * t1_weight) + (states[(t + 1) % self.state_count] * t2_weight)) / sum_states) * self.sum_move_weights
+
+            max_abs = max(float(states.max()), -float(states.min()))
+            score_range_normalizer = (max_abs / sum_states) * self.sum_move_weights
+            neg_add = (score_range_normalizer + score)
+            pos_add = (score_range_normalizer - score)
+
+            scaler = math.pow(self.history_count, self.scoreScaler)
+            neg_add *= scaler
+            pos_add *= scaler
+            score *= scaler / self.ScoreScalerMiddle
+
+        return -score, pos_add, neg_add
+
+    # The get_scoring_weight() results for each of an array of candidate degrees, against one predicted Move, as arrays of scores, pos_adds and neg_adds.
+    # E.g. for choosing the best, or worst, next move. The prediction's sum and max abs state are computed once, for all the candidates.
+    def score_candidates(self, predicted, degrees):
+        t, t1_weights, t2_weights = get_target_states_and_weights(degrees, self.state_count)
+        states = np.asarray(predicted.states)
+
+        sum_states = float(np.abs(states).sum())
+        if sum_states == 0:
+            return np.zeros(t.shape), np.zeros(t.shape), np.zeros(t.shape)
+
+        scores = (((states[t] * t1_weights) + (states[(t + 1) % self.state_count] * t2_weights)) / sum_states) * self.sum_move_weights
+        max_abs = max(float(states.max()), -float(states.min()))
+        score_range_normalizer = (max_abs / sum_states) * self.sum_move_weights
+
+        scaler = math.pow(self.history_count, self.scoreScaler)
+        neg_adds = (score_range_normalizer + scores) * scaler
+        pos_adds = (score_range_normalizer - scores) * scaler
+        return -(scores * (scaler / self.ScoreScalerMiddle)), pos_adds, neg_adds
+
+    # The base Move for state t, 'rotated' towards state t + 1 (base_move[j - 1] is the weight for state j at t + 1).
+    def get_move(self, degrees):
+        t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
+        base_move = self.base_move_weights[t]
+        return as_move((base_move * t1_weight) + (np.roll(base_move, 1) * t2_weight))
+
+    # The Move for the given degrees, as a vector over the basis (or as states, without a basis).
+    # np.roll(base_move, 1) above is the base Move of state t + 1, so this is the same blend of two rows of the coefficients table.
+    def get_move_coefficients(self, degrees):
+        t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
+        return (self.move_coefficients[t] * t1_weight) + (self.move_coefficients[(t + 1) % self.state_count] * t2_weight)
+
+    # Expands a vector over the basis back to states. Also works for an array of vectors, one per row.
+    def get_states(self, coefficients):
+        if self.basis is None:
+            return coefficients
+        return coefficients @ self.basis.T
+
+    # The score of get_scoring_weight() for each row of predicted, before the move count scaler, and not negated.
+    def get_raw_scores(self, degrees, predicted):
+        t, t1_weight, t2_weight = self.get_target_state_and_weights(degrees)
+        sum_states = np.abs(predicted).sum(axis=-1)
+        scores = (predicted[..., t] * t1_weight) + (predicted[..., (t + 1) % self.state_count] * t2_weight)
+        return np.divide(scores, sum_states, out=np.zeros_like(scores), where=sum_states > 0) * self.sum_move_weights
+
+    def get_target_state_and_weights(self, degrees):
+        if degrees == BaseMoveWeights.CircularRange:
+            degrees = 0
+        p = self.state_count * (degrees / BaseMoveWeights.CircularRange)
+        t = int(math.floor(p))
+        t2_weight = p - t
+        t1_weight = 1 - t2_weight
+        return t, t1_weight, t2_weight
@@ -0,0 +1,98 @@
+import concurrent.futures
+import os
+
+import numpy as np
+
+from MovePredictionEngineBatch import StepBlockSize
+from MovePredictionEngineNumpy import MovePredictionEngineNumpy
+
+"""
+Multi-threaded version of MovePredictionEngineNumpy, for a single game at high StateCounts (e.g. 120 or 240).
+
+The work of each move is independent across history depths: the prediction is a sum of one term per depth,
+and each depth's weights get their own rank-1 update. So the depths are split into one contiguous range per thread,
+and each thread computes its partial prediction, then updates the same weights (while they're still in its cache), in one task,
+with NumPy kernels that release the GIL. The partial predictions are summed at the end. Scores are the same as MovePredictionEngineNumpy, within floating point tolerance.
+
+At 30 states there's too little work per move to gain from threads. Ranges are only split while each thread still gets
+at least MinFloatsPerThread weights, so small histories and StateCounts run on the calling thread, the same as the base engine.
+"""
+
+# The fewest weights worth handing to a thread. Below this, the cost of dispatching the work outweighs the gain.
+MinFloatsPerThread = 256 * 1024
+
+# The thread pool shared by all threaded engines, created when first used.
+ThreadPool = None
+
+def get_thread_pool():
+    global ThreadPool
+    if ThreadPool is None:
+        ThreadPool = concurrent.futures.ThreadPoolExecutor(os.cpu_count(), thread_name_prefix="MovePredictionEngine")
+    return ThreadPool
+
+class MovePredictionEngineThreaded(MovePredictionEngineNumpy):
+    # thread_count is the most threads each move's work is split over. It defaults to the CPU count.
+    # It isn't saved in snapshots, as it depends on the machine, so a loaded engine uses the default (or its own thread_count, via from_snapshot_config()).
+    # engine_options are passed to MovePredictionEngineNumpy (e.g. basis, or decay).
+    def __init__(self, history_depth_count, base_weights=None, thread_count=None, **engine_options):
+        super().__init__(history_depth_count, base_weights, **engine_options)
+        self.thread_count = thread_count or os.cpu_count()
+
+    # Splits depths 0 to n into contiguous ranges, one per thread, each with at least MinFloatsPerThread weights.
+    def get_depth_ranges(self, n):
+        vector_size = self.history_buffer.shape[1]
+        count = max(1, min(self.thread_count, n, (n * vector_size * vector_size) // MinFloatsPerThread))
+        bounds = np.linspace(0, n, count + 1).astype(np.int64).tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    # Calls work(start, end) for each depth range, on the thread pool (or on this thread, for a single range), and returns the results.
+    def map_depth_ranges(self, work, n):
+        ranges = self.get_depth_ranges(n)
+        if len(ranges) == 1:
+            return [work(*ranges[0])]
+        return list(get_thread_pool().map(lambda depth_range: work(*depth_range), ranges))
+
+    def get_weights_prediction(self):
+        weights = self.weights
+        hist = self.history
+
+        def get_partial_prediction(start, end):
+            return np.matmul(weights[start:end], hist[start:end, :, None]).sum(axis=0)[:, 0]
+
+        return sum(self.map_depth_ranges(get_partial_prediction, self.history_count))
+
+    def add_weight_update(self, move, update):
+        weights = self.weights
+
+        def add_partial_update(start, end):
+            weights[start:end] += move[None, :, None] * update[start:end, None, :]
+
+        self.map_depth_ranges(add_partial_update, len(update))
+
+    # Each depth range's partial prediction and update are one task, so a move makes one pass over the weights, with one dispatch.
+    # Within a range, the depths are done in blocks of about StepBlockSize weights, each updated right after its prediction, while it's in cache
+    # (the same as MovePredictionEngineBatch's steps). While updates are kept aside for a fork (see MovePredictionEngineNumpy.fork()), the base engine's separate passes are used.
+    def get_prediction_and_update_weights(self, move):
+        if self.weight_sharers is not None and len(self.weight_sharers) > 1:
+            return super().get_prediction_and_update_weights(move)
+        self.own_weights()
+        weight_scale = self.weight_scale
+        update = self.get_weight_update()
+        weights = self.weights
+        hist = self.history
+        vector_size = self.history_buffer.shape[1]
+        depth_block = max(1, StepBlockSize // (vector_size * vector_size))
+
+        def predict_and_update(start, end):
+            partial = np.zeros(vector_size)
+            for d in range(start, end, depth_block):
+                block_end = min(d + depth_block, end)
+                partial += np.matmul(weights[d:block_end], hist[d:block_end, :, None]).sum(axis=0)[:, 0]
+                weights[d:block_end] += move[None, :, None] * update[d:block_end, None, :]
+            return partial
+
+        pred = sum(self.map_depth_ranges(predict_and_update, self.history_count))
+        if self.decay is not None:
+            pred *= weight_scale
+        self.renormalize_weights()
+        return pred
@@ -0,0 +1,213 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from MovePredictionEngine import BaseMoveWeights
+from MovePredictionEngineIndexed import MovePredictionEngineIndexed
+from StateCountStudy import get_game
+
+"""
+Null distributions of final scores: the scores of a random (mindless) player, per game length and engine config, for calibrating real scores.
+
+Random play averages 100 at any length, but its spread narrows as games get longer (a StdDev of ~7 at 300 moves, and much more at 30).
+So the same score is more or less remarkable depending on the move count. A NullDistribution is built once, by Monte Carlo:
+game_count seeded random games, scored over a pool of processes in chunks of games, with the (exact, and fastest) indexed engine.
+It's then kept as tables on a uniform grid, so lookups are O(1), with no simulation at request time:
+- The CDF of the random scores, every GridStep points from 0 to 200. get_percentile() and get_p_value() interpolate between 2 entries.
+- The random scores at every QuantileStep percentiles, for get_score_at_percentile().
+
+get_null_distribution() returns the distribution for a config, from memory, then from the cache directory, and only then builds (and saves) it.
+The tables for the usual game lengths can be built ahead of time, with: python NullDistribution.py --moves 30 80 150 300
+"""
+
+# Scores of the tables' CDF grid. Final scores are always from 0 to 200.
+MinScore = 0.0
+MaxScore = 200.0
+GridStep = 0.01
+
+QuantileStep = 0.1
+
+DefaultGameCount = 10000
+
+DefaultCacheDir = os.path.join(os.path.expanduser("~"), ".cache", "MindMove", "NullDistributions")
+
+# The distributions used by this process, by config. See get_null_distribution().
+Distributions = {}
+
+# Scores random games first_index to first_index + game_count of a distribution, in a worker. Returns their final scores.
+def simulate_scores(move_count, history_depth, state_count, engine_options, seed, first_index, game_count):
+    base_weights = BaseMoveWeights.get(state_count)
+    final_scores = []
+    for index in range(first_index, first_index + game_count):
+        engine = MovePredictionEngineIndexed(history_depth, base_weights, **engine_options)
+        for degree in get_game(seed, index, move_count):
+            engine.score_move(degree)
+        final_scores.append(engine.get_final_score())
+    return final_scores
+
+# The identifying settings of a distribution. engine_options are passed to the engine (windowed, or decay), as they change scores.
+# history_depth is the engines' history depth, which defaults to the move count (as in test_score_move_series()). A shorter depth drops
+# the oldest Moves from the history, and windowed engines (which need it) also drop their terms from the weights.
+def get_config(move_count, state_count=BaseMoveWeights.DefaultStateCount, engine_options=None, game_count=DefaultGameCount, seed=0, history_depth=None):
+    engine_options = dict(sorted((engine_options or {}).items()))
+    history_depth = history_depth or move_count
+    if not 2 <= history_depth <= move_count:
+        raise ValueError("history_depth must be from 2 to move_count")
+    if engine_options.get("windowed") and history_depth == move_count:
+        raise ValueError("A windowed engine only differs when its history_depth is less than move_count, as the window never slides otherwise")
+    return {"move_count": move_count, "history_depth": history_depth, "state_count": state_count, "engine_options": engine_options,
+            "game_count": game_count, "seed": seed}
+
+def get_cache_path(cache_dir, config):
+    depth = "" if config["history_depth"] == config["move_count"] else f"-depth{config['history_depth']}"
+    options = "".join(f"-{name}{value}" for name, value in config["engine_options"].items())
+    return os.path.join(cache_dir, f"null-{config['move_count']}moves{depth}-{config['state_count']}states{options}-{config['game_count']}games-seed{config['seed']}.npz")
+
+# Gets the distribution for a config: from this process's Distributions, else from cache_dir (if given), else by building it (and saving it to cache_dir).
+def get_null_distribution(move_count, state_count=BaseMoveWeights.DefaultStateCount, engine_options=None, game_count=DefaultGameCount, seed=0,
+                          cache_dir=DefaultCacheDir, worker_count=None, progress=None, history_depth=None):
+    config = get_config(move_count, state_count, engine_options, game_count, seed, history_depth)
+    key = json.dumps(config, sort_keys=True)
+    distribution = Distributions.get(key)
+    if distribution is not None:
+        return distribution
+
+    path = None if cache_dir is None else get_cache_path(cache_dir, config)
+    if path is not None and os.path.exists(path):
+        distribution = NullDistribution.load(path)
+    else:
+        distribution = NullDistribution.build(config, worker_count, progress=progress)
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            distribution.save(path)
+    return Distributions.setdefault(key, distribution)
+
+class NullDistribution:
+    # cdf is the fraction of random scores at or below each grid score. quantiles are the random scores at each QuantileStep percentile.
+    def __init__(self, config, cdf, quantiles, mean, std):
+        self.config = config
+        self.move_count = config["move_count"]
+        self.game_count = config["game_count"]
+        self.mean = mean
+        self.std = std
+        self.cdf = cdf
+        self.quantiles = quantiles
+
+        # Lists, as indexing them for one value is faster than indexing an array.
+        self.cdf_values = cdf.tolist()
+        self.quantile_values = quantiles.tolist()
+
+    # Simulates the config's random games, over worker_count processes, chunk_size games per work unit, and builds the tables from their scores.
+    @classmethod
+    def build(cls, config, worker_count=None, chunk_size=64, progress=None):
+        scores = np.zeros(config["game_count"])
+        with concurrent.futures.ProcessPoolExecutor(worker_count) as executor:
+            futures = {}
+            for first_index in range(0, config["game_count"], chunk_size):
+                count = min(chunk_size, config["game_count"] - first_index)
+                future = executor.submit(simulate_scores, config["move_count"], config["history_depth"], config["state_count"], config["engine_options"], config["seed"], first_index, count)
+                futures[future] = (first_index, count)
+
+            scored_count = 0
+            for future in concurrent.futures.as_completed(futures):
+                first_index, count = futures[future]
+                scores[first_index:first_index + count] = future.result()
+                scored_count += count
+                if progress is not None:
+                    progress(scored_count)
+        return cls.from_scores(config, scores)
+
+    # Builds the tables from simulated scores. Games scored with no weight (NaN) are left out.
+    @classmethod
+    def from_scores(cls, config, scores):
+        scores = np.sort(np.asarray(scores, dtype=np.float64))
+        scores = scores[~np.isnan(scores)]
+        if not len(scores):
+            raise ValueError("No scores to build a distribution from")
+        grid = MinScore + GridStep * np.arange(int(round((MaxScore - MinScore) / GridStep)) + 1)
+        cdf = np.searchsorted(scores, grid, side="right") / len(scores)
+        quantiles = np.percentile(scores, QuantileStep * np.arange(int(round(100 / QuantileStep)) + 1))
+        std = float(scores.std(ddof=1)) if len(scores) > 1 else 0.0
+        return cls(config, cdf, quantiles, float(scores.mean()), std)
+
+    # The fraction of random scores at or below score, interpolated between the two nearest grid scores.
+    def get_cdf(self, score):
+        if math.isnan(score):
+            return math.nan
+        x = (score - MinScore) / GridStep
+        if x <= 0:
+            return self.cdf_values[0]
+        i = int(x)
+        if i >= len(self.cdf_values) - 1:
+            return self.cdf_values[-1]
+        below = self.cdf_values[i]
+        return below + (self.cdf_values[i + 1] - below) * (x - i)
+
+    # The percentile (from 0 to 100) of score among random players' scores, i.e. the percentage of random games scoring at or below it.
+    def get_percentile(self, score):
+        return self.get_cdf(score) * 100
+
+    # The one-sided p-value of score: the chance a random player scores at least as high (or with lower, at most as high, e.g. for how repetitive a low score is).
+    # Estimated as (1 + count at or above) / (1 + game count), so it's never 0 beyond the highest simulated score.
+    def get_p_value(self, score, lower=False):
+        cdf = self.get_cdf(score)
+        if lower:
+            return (1 + cdf * self.game_count) / (1 + self.game_count)
+        return (1 + (1 - cdf) * self.game_count) / (1 + self.game_count)
+
+    # The random players' score at percentile (from 0 to 100), interpolated between the two nearest table entries.
+    def get_score_at_percentile(self, percentile):
+        x = min(max(percentile / QuantileStep, 0), len(self.quantile_values) - 1)
+        i = min(int(x), len(self.quantile_values) - 2)
+        below = self.quantile_values[i]
+        return below + (self.quantile_values[i + 1] - below) * (x - i)
+
+    def save(self, path):
+        temp_path = path + ".tmp.npz"
+        header = dict(config=self.config, mean=self.mean, std=self.std, grid_step=GridStep, quantile_step=QuantileStep)
+        np.savez(temp_path, header=np.array(json.dumps(header)), cdf=self.cdf, quantiles=self.quantiles)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            if header["grid_step"] != GridStep or header["quantile_step"] != QuantileStep:
+                raise ValueError(f"{path} has tables of a different grid")
+            return cls(header["config"], data["cdf"], data["quantiles"], header["mean"], header["std"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds (and caches) the null distributions of random players' scores, per game length.")
+    parser.add_argument("--moves", type=int, nargs="+", default=[30, 80, 150, 300], help="Game lengths")
+    parser.add_argument("--state-count", type=int, default=BaseMoveWeights.DefaultStateCount)
+    parser.add_argument("--history-depth", type=int, default=None, help="Engine history depth (default: each game's move count)")
+    parser.add_argument("--windowed", action="store_true", help="Windowed engines (needs a --history-depth below the move counts)")
+    parser.add_argument("--decay", type=float, default=None)
+    parser.add_argument("--games", type=int, default=DefaultGameCount, help="Random games per distribution")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=DefaultCacheDir)
+    args = parser.parse_args()
+    if min(args.moves) < 2:
+        parser.error("Games must have at least 2 moves")
+    if args.windowed and (args.history_depth is None or args.history_depth >= min(args.moves)):
+        parser.error("--windowed needs a --history-depth below the move counts")
+
+    engine_options = {}
+    if args.windowed:
+        engine_options["windowed"] = True
+    if args.decay is not None:
+        engine_options["decay"] = args.decay
+
+    for move_count in args.moves:
+        progress = lambda count: print(f"\r{move_count} moves: {count}/{args.games} games scored", end="", file=sys.stderr, flush=True)
+        distribution = get_null_distribution(move_count, args.state_count, engine_options, args.games, args.seed, args.cache_dir, args.workers, progress,
+                                             args.history_depth and min(args.history_depth, move_count))
+        print(file=sys.stderr)
+        percentiles = ", ".join(f"p{p} = {distribution.get_score_at_percentile(p):.2f}" for p in (1, 5, 50, 95, 99))
+        print(f"{move_count} moves: mean = {distribution.mean:.2f}, StdDev = {distribution.std:.2f}, {percentiles}")
@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import collections
+import heapq
+import json
+import math
+import os
+import stat
+import time
+
+import numpy as np
+
+from MovePredictionEngine import BaseMoveWeights
+from MovePredictionEngineBatch import MovePredictionEngineBatch, get_final_scores
+
+"""
+Local scoring daemon, serving many clients over a Unix socket.
+
+Each connection is one scoring session (e.g. one drawing), with its own game in a shared MovePredictionEngineBatch.
+Rather than one engine step per message, moves from all sessions are collected for up to batch_window seconds
+(or until max_batch_size moves are pending), and then scored together: each batched step records one move for every session
+with a move pending. So a longer window trades latency for throughput.
+
+The protocol is JSON lines. Each request gets one response line, in order, and requests can be pipelined:
+    {"op": "record", "degrees": 123.4}    -> {"score": ..., "pos_add": ..., "neg_add": ..., "final_score": ...}
+    {"op": "reset", "history_depth": 300} -> {"history_depth": 300}    Starts a new game (history_depth is optional, up to the daemon's).
+    {"op": "metrics"}                     -> Request latency percentiles (ms), and batch counts and sizes.
+Errors are returned as {"error": "..."}. final_score is null until a move has been scored with any weight.
+
+Run with: python ScoringDaemon.py --socket /tmp/scoring.sock
+"""
+
+class ScoringDaemon:
+    # max_sessions is the number of game slots in the batch engine. Its weights are max_sessions * history_depth * StateCount^2 floats.
+    def __init__(self, max_sessions=64, history_depth_count=300, base_weights=None, batch_window=0.002, max_batch_size=256, latency_sample_count=10000):
+        self.engine = MovePredictionEngineBatch(max_sessions, history_depth_count, base_weights=base_weights)
+        self.history_depth = history_depth_count
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+
+        # A heap, so each new session takes the lowest free slot. Active sessions then stay close together, and a batched step
+        # records their moves in a few runs of consecutive slots (see MovePredictionEngineBatch.record_moves_and_get_predicted()).
+        self.free_slots = list(range(max_sessions))
+        self.pos_sums = np.zeros(max_sessions)
+        self.neg_sums = np.zeros(max_sessions)
+
+        # Moves (and game resets) waiting for the next batch, as (slot, degrees, history_depth, future, received time).
+        # Resets have degrees None, and moves have history_depth None.
+        self.pending = []
+        self.pending_added = asyncio.Event()
+
+        # The latencies of the most recent requests (from received, to scored), and batch counts.
+        self.latencies = collections.deque(maxlen=latency_sample_count)
+        self.request_count = 0
+        self.batch_count = 0
+        self.step_count = 0
+
+    async def serve(self, socket_path):
+        # A stale socket from an earlier run is replaced, but anything else at the path is left alone.
+        if os.path.exists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise FileExistsError(f"{socket_path} exists, and isn't a socket")
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, socket_path)
+        batcher = asyncio.get_running_loop().create_task(self.run_batches())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    # One session per connection. Requests are read (and queued) as they arrive, while responses are written in order as they're ready.
+    async def handle_connection(self, reader, writer):
+        slot = None
+        responses = asyncio.Queue()
+        response_writer = asyncio.get_running_loop().create_task(self.write_responses(responses, writer))
+        try:
+            if not self.free_slots:
+                await responses.put(self.get_error_response("No free sessions"))
+                return
+            slot = heapq.heappop(self.free_slots)
+            self.add_pending(slot, None, self.history_depth)
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await responses.put(self.handle_request(slot, line))
+        finally:
+            await responses.put(None)
+            await response_writer
+            writer.close()
+            if slot is not None:
+                heapq.heappush(self.free_slots, slot)
+
+    # Returns a future of the response, so record requests can be pipelined.
+    def handle_request(self, slot, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object")
+            op = request.get("op")
+            if op == "record":
+                degrees = float(request["degrees"])
+                if not 0 <= degrees <= BaseMoveWeights.CircularRange:
+                    raise ValueError(f"degrees must be from 0 to {BaseMoveWeights.CircularRange}")
+                return self.add_pending(slot, degrees, None)
+            if op == "reset":
+                history_depth = int(request.get("history_depth", self.history_depth))
+                if not 2 <= history_depth <= self.history_depth:
+                    raise ValueError(f"history_depth must be from 2 to {self.history_depth}")
+                return self.add_pending(slot, None, history_depth)
+            if op == "metrics":
+                return self.get_response(self.get_metrics())
+            raise ValueError(f"Unknown op {op!r}")
+        except (ValueError, KeyError, TypeError) as e:
+            return self.get_error_response(str(e))
+
+    # Adds a move, or a game reset, to the next batch. Returns a future of its response.
+    def add_pending(self, slot, degrees, history_depth):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((slot, degrees, history_depth, future, time.perf_counter()))
+        self.pending_added.set()
+        return future
+
+    async def write_responses(self, responses, writer):
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            try:
+                result = await response
+            except Exception as e:
+                result = {"error": str(e)}
+            try:
+                writer.write((json.dumps(result) + "\n").encode("utf-8"))
+                await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                break
+
+    def get_response(self, response):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(response)
+        return future
+
+    def get_error_response(self, message):
+        return self.get_response({"error": message})
+
+    # Waits for moves, then for the rest of the batch window (or until max_batch_size moves are pending), and scores them.
+    # The engine steps run on a thread, so connections are served meanwhile. Only this task uses the engine, so steps never overlap.
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.pending_added.wait()
+            deadline = (self.pending[0][4] if self.pending else time.perf_counter()) + self.batch_window
+            while len(self.pending) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                self.pending_added.clear()
+                try:
+                    await asyncio.wait_for(self.pending_added.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self.pending = self.pending[:self.max_batch_size], self.pending[self.max_batch_size:]
+            if not self.pending:
+                self.pending_added.clear()
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(None, self.score_batch, batch)
+            except Exception as e:
+                for slot, degrees, history_depth, future, received in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            for (slot, degrees, history_depth, future, received), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+                self.latencies.append(now - received)
+            self.request_count += len(batch)
+            self.batch_count += 1
+
+    # Scores a batch of moves (and resets). Each step takes the next item of every slot with items left, so each slot's items stay in order:
+    # it resets the slots whose item is a reset, then records the moves of the others, in one batched engine call.
+    def score_batch(self, batch):
+        # The step of each item: how many items of the same slot are before it in the batch.
+        steps = []
+        slot_counts = collections.Counter()
+        for slot, degrees, history_depth, future, received in batch:
+            steps.append(slot_counts[slot])
+            slot_counts[slot] += 1
+
+        results = [None] * len(batch)
+        for step in range(max(slot_counts.values(), default=0)):
+            indexes = []
+            for i, s in enumerate(steps):
+                if s != step:
+                    continue
+                slot, degrees, history_depth, future, received = batch[i]
+                if degrees is None:
+                    self.engine.reset_games([slot], [history_depth])
+                    self.pos_sums[slot] = self.neg_sums[slot] = 0
+                    results[i] = {"history_depth": history_depth}
+                else:
+                    indexes.append(i)
+            if not indexes:
+                continue
+
+            games = np.array([batch[i][0] for i in indexes])
+            degrees = np.array([batch[i][1] for i in indexes])
+
+            predicted = self.engine.record_moves_and_get_predicted(degrees, games)
+            scores, pos_adds, neg_adds = self.engine.get_scoring_weights(degrees, predicted, games)
+            self.pos_sums[games] += pos_adds
+            self.neg_sums[games] += neg_adds
+            final_scores = get_final_scores(self.pos_sums[games], self.neg_sums[games])
+            self.step_count += 1
+
+            for i, score, pos_add, neg_add, final_score in zip(indexes, scores.tolist(), pos_adds.tolist(), neg_adds.tolist(), final_scores.tolist()):
+                results[i] = {"score": score, "pos_add": pos_add, "neg_add": neg_add, "final_score": None if math.isnan(final_score) else final_score}
+        return results
+
+    def get_metrics(self):
+        latencies = np.array(self.latencies) * 1000
+        metrics = {
+            "requests": self.request_count,
+            "batches": self.batch_count,
+            "steps": self.step_count,
+            "mean_batch_size": self.request_count / self.batch_count if self.batch_count else 0,
+            "active_sessions": self.engine.game_count - len(self.free_slots),
+        }
+        if len(latencies):
+            metrics.update(latency_ms_mean=float(latencies.mean()), latency_ms_p50=float(np.percentile(latencies, 50)),
+                           latency_ms_p99=float(np.percentile(latencies, 99)), latency_ms_max=float(latencies.max()))
+        return metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scores moves for many local clients, batching them across sessions.")
+    parser.add_argument("--socket", default="/tmp/scoring.sock", help="Unix socket path")
+    parser.add_argument("--sessions", type=int, default=64, help="Maximum simultaneous sessions")
+    parser.add_argument("--history-depth", type=int, default=300, help="Maximum history depth of each session")
+    parser.add_argument("--state-count", type=int, default=BaseMoveWeights.DefaultStateCount)
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="How long to collect moves before scoring them")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="Score as soon as this many moves are pending")
+    args = parser.parse_args()
+
+    async def main():
+        daemon = ScoringDaemon(args.sessions, args.history_depth, BaseMoveWeights.get(args.state_count), args.batch_window_ms / 1000, args.max_batch_size)
+        await daemon.serve(args.socket)
+
+    asyncio.run(main())
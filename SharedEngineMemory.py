@@ -0,0 +1,97 @@
+import io
+import json
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from MovePredictionEngine import BaseMoveWeights
+from MovePredictionEngineNumpy import (BaseMoveWeightsTables, MovePredictionEngineNumpy, SnapshotPrefixSize, get_base_move_weights,
+                                       get_snapshot_header_length)
+
+"""
+Shares base weights tables, and optionally whole engines, between processes, through multiprocessing.shared_memory.
+
+The parent process publishes them once, with a SharedEngineMemory, and passes the block names to its workers (e.g. as pool initializer arguments).
+Workers then attach with attach_base_weights() and attach_engine(), which use the shared memory directly, without copying or rebuilding anything.
+So startup time and memory use stay flat as workers are added.
+
+- A base weights table is shared read-only. Attaching registers it, so engines of that StateCount (and BaseMoveWeights.get()) use it.
+- An engine is shared in the snapshot layout (see MovePredictionEngineNumpy.save()), so its arrays are read-only views of the shared block.
+  Its history position, move count and sums are per process, so an attached engine can't record moves itself (that raises a ValueError).
+  Each worker records on attached.fork() instead (e.g. to score from a shared, seeded starting point). The fork shares the weights,
+  and copies them only when it adds its own updates to them (see fork()).
+
+The blocks stay available until the SharedEngineMemory is closed, so the parent should close it only after its workers are done.
+"""
+
+# The blocks attached by this process. They're kept open for as long as the process runs, as arrays (and so engines) use their memory.
+AttachedBlocks = {}
+
+# Opens a block created by another process. Workers started by multiprocessing share their parent's resource tracker,
+# so attaching doesn't change when the block is cleaned up: that's still when its SharedEngineMemory is closed.
+def attach_block(name):
+    block = AttachedBlocks.get(name)
+    if block is None:
+        block = AttachedBlocks.setdefault(name, shared_memory.SharedMemory(name))
+    return block
+
+# Attaches a base weights table published by SharedEngineMemory.publish_base_weights(). Returns the BaseMoveWeights for its StateCount.
+# If this process already has BaseMoveWeights for the StateCount (e.g. inherited from a forked parent), those are kept.
+def attach_base_weights(name, state_count):
+    table = np.ndarray((state_count, state_count), np.float64, attach_block(name).buf)
+    table.flags.writeable = False
+    base_weights = BaseMoveWeights.Cache.get(state_count)
+    if base_weights is None:
+        base_weights = BaseMoveWeights.Cache.setdefault(state_count, BaseMoveWeights.from_table(table))
+    BaseMoveWeightsTables.setdefault(base_weights, table)
+    return base_weights
+
+# Attaches an engine published by SharedEngineMemory.publish_engine(). Its arrays are read-only views of the shared block, so moves are recorded on its forks.
+def attach_engine(name, engine_type=MovePredictionEngineNumpy):
+    buffer = attach_block(name).buf
+    header_length = get_snapshot_header_length(bytes(buffer[:SnapshotPrefixSize]))
+    header = json.loads(bytes(buffer[SnapshotPrefixSize:SnapshotPrefixSize + header_length]).decode("utf-8"))
+    arrays = {}
+    for entry in header["arrays"]:
+        a = np.ndarray(tuple(entry["shape"]), np.dtype(entry["dtype"]), buffer, entry["offset"])
+        a.flags.writeable = False
+        arrays[entry["name"]] = a
+    return engine_type.from_snapshot(header, arrays)
+
+# The shared memory blocks published by this process. Use as a context manager, or close() it, to release them.
+class SharedEngineMemory:
+    def __init__(self):
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Publishes the base weights table for state_count. Returns the block name, for attach_base_weights().
+    def publish_base_weights(self, state_count=BaseMoveWeights.DefaultStateCount):
+        table = get_base_move_weights(BaseMoveWeights.get(state_count))
+        block = self.create_block(table.nbytes)
+        np.ndarray(table.shape, table.dtype, block.buf)[:] = table
+        return block.name
+
+    # Publishes a copy of engine (in its current state). Returns the block name, for attach_engine().
+    def publish_engine(self, engine):
+        snapshot = io.BytesIO()
+        engine.save(snapshot)
+        data = snapshot.getbuffer()
+        block = self.create_block(len(data))
+        block.buf[:len(data)] = data
+        return block.name
+
+    def create_block(self, size):
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.blocks.append(block)
+        return block
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
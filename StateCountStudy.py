@@ -0,0 +1,134 @@
+import argparse
+import concurrent.futures
+import json
+import random
+import sys
+
+import numpy as np
+
+from EngineBackends import Backends, create_engine
+from MovePredictionEngine import BaseMoveWeights
+from MovePredictionEngineBatch import score_move_series
+
+"""
+Reproduces the StateCount accuracy study quoted in BaseMoveWeights: scores the same seeded random games at several StateCounts,
+and compares each StateCount's final scores with the first (the baseline, normally 30).
+
+For each game length and StateCount, the report has the mean and standard deviation of the final scores.
+For each StateCount compared with the baseline, it has the mean and standard deviation of the absolute score differences,
+and the 95% upper bound, mean + 1.96 * StdDev (as in BaseMoveWeights, as the differences fit a normal distribution closely enough),
+along with the mean signed difference, and the observed 95th percentile and max of the absolute differences.
+
+Games are scored in work units of chunk_size games, over a pool of processes. Each game is generated from its own seed in the worker,
+so nothing but the scores is sent between processes. The default backend is "indexed", which is exact, and O(depth * StateCount) per move,
+so it's the fastest engine at high StateCounts. The batch engine (backend "batch-corpus") is O(depth * StateCount^2) per move,
+and its weights are chunk_size * depth * StateCount^2 floats, so it's only practical at low StateCounts.
+
+Run with: python StateCountStudy.py --state-counts 30 60 120 240 --games 1000 --moves 80 300 --output study.json
+"""
+
+StudyStateCounts = (30, 60, 120, 240)
+
+# The multiple of the StdDev added to the mean difference, for the 95% upper bound quoted in BaseMoveWeights.
+UpperBoundZ = 1.96
+
+# Random game index of a study, from its own seed. The same games are scored at every StateCount.
+def get_game(seed, index, move_count):
+    rnd = random.Random(seed * 1000003 + index)
+    return [rnd.random() * BaseMoveWeights.CircularRange for _ in range(move_count)]
+
+# Scores games first_index to first_index + game_count, at one StateCount, in a worker. Returns their final scores.
+def score_games(backend, state_count, move_count, seed, first_index, game_count):
+    base_weights = BaseMoveWeights.get(state_count)
+    games = [get_game(seed, index, move_count) for index in range(first_index, first_index + game_count)]
+    if backend == "batch-corpus":
+        return score_move_series(np.array(games), base_weights=base_weights)[0].tolist()
+
+    final_scores = []
+    for degrees in games:
+        engine = create_engine(backend, move_count, base_weights)
+        for degree in degrees:
+            engine.score_move(degree)
+        final_scores.append(engine.get_final_score())
+    return final_scores
+
+# The comparison of scores with the baseline scores, of the same games.
+def compare_scores(scores, baseline_scores):
+    differences = scores - baseline_scores
+    abs_differences = np.abs(differences)
+    mean = float(abs_differences.mean())
+    std = float(abs_differences.std(ddof=1)) if len(abs_differences) > 1 else 0.0
+    return {
+        "mean_abs_difference": mean,
+        "std_abs_difference": std,
+        "upper_bound_95": mean + UpperBoundZ * std,
+        "mean_difference": float(differences.mean()),
+        "p95_abs_difference": float(np.percentile(abs_differences, 95)),
+        "max_abs_difference": float(abs_differences.max()),
+    }
+
+# Runs the study, and returns the report. The first of state_counts is the baseline the others are compared with.
+# progress, if given, is called with the number of games scored so far (counting each game once per StateCount and move count).
+def run_study(state_counts=StudyStateCounts, game_count=1000, move_counts=(300,), seed=0, backend="indexed", worker_count=None, chunk_size=16, progress=None):
+    scores = {(move_count, state_count): np.zeros(game_count) for move_count in move_counts for state_count in state_counts}
+    with concurrent.futures.ProcessPoolExecutor(worker_count) as executor:
+        # The slowest work (highest StateCounts, and longest games) is submitted first, so the pool's workers finish close together.
+        futures = {}
+        for move_count in sorted(move_counts, reverse=True):
+            for state_count in sorted(state_counts, reverse=True):
+                for first_index in range(0, game_count, chunk_size):
+                    count = min(chunk_size, game_count - first_index)
+                    future = executor.submit(score_games, backend, state_count, move_count, seed, first_index, count)
+                    futures[future] = (move_count, state_count, first_index, count)
+
+        scored_count = 0
+        for future in concurrent.futures.as_completed(futures):
+            move_count, state_count, first_index, count = futures[future]
+            scores[move_count, state_count][first_index:first_index + count] = future.result()
+            scored_count += count
+            if progress is not None:
+                progress(scored_count)
+
+    baseline = state_counts[0]
+    results = []
+    for move_count in move_counts:
+        result = {"moves": move_count, "scores": {}, "comparisons": {}}
+        for state_count in state_counts:
+            game_scores = scores[move_count, state_count]
+            result["scores"][state_count] = {"mean": float(game_scores.mean()), "std": float(game_scores.std(ddof=1)) if game_count > 1 else 0.0}
+            if state_count != baseline:
+                result["comparisons"][f"{baseline} vs {state_count}"] = compare_scores(game_scores, scores[move_count, baseline])
+        results.append(result)
+
+    settings = {"state_counts": list(state_counts), "games": game_count, "move_counts": list(move_counts), "seed": seed, "backend": backend}
+    return {"settings": settings, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares final scores of the same seeded random games, at several StateCounts.")
+    parser.add_argument("--state-counts", type=int, nargs="+", default=list(StudyStateCounts), help="StateCounts; the first is the baseline")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--moves", type=int, nargs="+", default=[300], help="Game lengths")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="indexed", choices=list(Backends) + ["batch-corpus"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Games per work unit")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+    if min(args.moves) < 2:
+        parser.error("Games must have at least 2 moves")
+
+    total = args.games * len(args.state_counts) * len(args.moves)
+    progress = lambda count: print(f"\r{count}/{total} games scored", end="", file=sys.stderr, flush=True)
+    report = run_study(args.state_counts, args.games, args.moves, args.seed, args.backend, args.workers, args.chunk_size, progress)
+    print(file=sys.stderr)
+
+    for result in report["results"]:
+        print(f"{result['moves']}-move games, {args.games} games:")
+        for state_count, stats in result["scores"].items():
+            print(f"- {state_count}-State: Mean score = {stats['mean']:.2f}, StdDev = {stats['std']:.2f}")
+        for name, comparison in result["comparisons"].items():
+            print(f"- {name}: Mean difference = {comparison['mean_abs_difference']:.3f}, StdDev = {comparison['std_abs_difference']:.3f}. "
+                  f"95% upper-bound = {comparison['upper_bound_95']:.2f} (observed 95th percentile = {comparison['p95_abs_difference']:.2f})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)